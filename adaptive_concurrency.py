@@ -0,0 +1,170 @@
+"""
+AIMD-style concurrency controller for Telegram downloads.
+
+Used like an `asyncio.Semaphore` (`async with limiter:`), but the number of
+slots changes at runtime. Every `window` seconds the controller looks at the
+aggregate bytes/s reported through `record_bytes`:
+
+  * if all slots are busy and tasks are waiting, it adds one slot (additive increase)
+  * if the previous increase did not raise throughput noticeably, it takes the slot back
+  * on FloodWait or other RPC errors it halves the limit (multiplicative decrease)
+    and holds off probing for a few windows
+"""
+import asyncio
+import collections
+import time
+
+
+class AdaptiveLimiter:
+    def __init__(self, initial=3, min_limit=1, max_limit=8, window=10.0, min_gain=0.10, cooldown_windows=3):
+        """
+        Args:
+            initial (int): starting number of slots
+            min_limit (int): never go below this many slots
+            max_limit (int): never go above this many slots
+            window (float): seconds between adjustments
+            min_gain (float): relative throughput gain an extra slot must bring to be kept
+            cooldown_windows (int): windows to wait after a decrease before probing again
+        """
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = max(min_limit, min(initial, max_limit))
+        self.window = window
+        self.min_gain = min_gain
+        self.cooldown_windows = cooldown_windows
+
+        self.in_use = 0
+        self.throughput = 0.0  # bytes/s over the last window
+        self.total_bytes = 0
+        self.flood_waits = 0
+        self.errors = 0
+
+        self._waiters = collections.deque()
+        self._window_bytes = 0
+        self._window_start = time.monotonic()
+        self._probe_baseline = None  # throughput before the last increase, if it is being evaluated
+        self._cooldown = 0
+        self._demand = False  # work waited for a slot outside acquire() during this window
+
+    # ---- semaphore interface ----
+
+    async def acquire(self):
+        if self.in_use < self.limit and not self._waiters:
+            self.in_use += 1
+            return
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # The slot was granted just as we were cancelled; hand it on
+                self.release()
+            raise
+
+    def try_acquire(self):
+        """Takes a slot if one is free right now, without waiting."""
+        if self.in_use < self.limit and not self._waiters:
+            self.in_use += 1
+            return True
+        return False
+
+    def note_demand(self):
+        """
+        Tells the limiter that work is waiting for it without calling acquire()
+        (e.g. the scheduler holding back jobs), so a full limiter still counts as saturated.
+        """
+        self._demand = True
+
+    def release(self):
+        self.in_use -= 1
+        self._wake()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+    def _wake(self):
+        while self._waiters and self.in_use < self.limit:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                self.in_use += 1
+                fut.set_result(True)
+
+    # ---- feedback ----
+
+    def record_bytes(self, count):
+        """Called from download progress callbacks with the bytes received since the last call."""
+        self._window_bytes += count
+        self.total_bytes += count
+
+    def on_flood_wait(self, seconds):
+        self.flood_waits += 1
+        self._decrease(f"FloodWait {seconds}s")
+
+    def on_error(self, error):
+        self.errors += 1
+        self._decrease(f"RPC error: {error}")
+
+    def _decrease(self, reason):
+        new_limit = max(self.min_limit, self.limit // 2)
+        self._probe_baseline = None
+        self._cooldown = self.cooldown_windows
+        self._set_limit(new_limit, reason)
+
+    def _set_limit(self, new_limit, reason):
+        if new_limit == self.limit:
+            return
+        print(f"⚙️  Download concurrency {self.limit} → {new_limit} ({reason}, {self.throughput / (1024 * 1024):.1f} MB/s)")
+        self.limit = new_limit
+        self._wake()
+
+    def adjust(self):
+        """Closes the current measurement window and updates the limit."""
+        now = time.monotonic()
+        elapsed = now - self._window_start
+        if elapsed <= 0:
+            return
+        self.throughput = self._window_bytes / elapsed
+        self._window_bytes = 0
+        self._window_start = now
+        demand, self._demand = self._demand, False
+
+        if self._cooldown:
+            self._cooldown -= 1
+            return
+
+        if self._probe_baseline is not None:
+            baseline = self._probe_baseline
+            self._probe_baseline = None
+            if self.throughput < baseline * (1 + self.min_gain):
+                # The extra slot did not help; give it back and stop probing for a while
+                self._cooldown = self.cooldown_windows
+                self._set_limit(max(self.min_limit, self.limit - 1), "no throughput gain")
+            return
+
+        saturated = self.in_use >= self.limit and (demand or any(not f.done() for f in self._waiters))
+        if saturated and self.limit < self.max_limit:
+            self._probe_baseline = self.throughput
+            self._set_limit(self.limit + 1, "probing")
+
+    async def run(self):
+        """Background task: adjusts the limit once per window until cancelled."""
+        while True:
+            await asyncio.sleep(self.window)
+            self.adjust()
+
+    def snapshot(self):
+        """Current state, for logging or status endpoints."""
+        return {
+            "limit": self.limit,
+            "in_use": self.in_use,
+            "waiting": sum(1 for f in self._waiters if not f.done()),
+            "throughput_bps": round(self.throughput),
+            "total_bytes": self.total_bytes,
+            "flood_waits": self.flood_waits,
+            "errors": self.errors,
+        }
@@ -4,7 +4,21 @@ import re
 import json
 import sys
 from telethon import TelegramClient, errors
+from telethon.tl.types import InputMessagesFilterDocument, InputMessagesFilterVideo
 from dotenv import load_dotenv
+from scan_checkpoint import ScanCheckpoint
+import fast_download
+from adaptive_concurrency import AdaptiveLimiter
+from delete_batcher import DeletionBatcher
+from disk_budget import DiskBudget
+from download_scheduler import DownloadScheduler, PRIORITY_POLICIES
+from transfer_progress import TransferProgress
+from episode_manifest import append_episode
+from stream_checksum import StreamHasher
+from flood_governor import FloodGovernor
+from telegram_session import DEFAULT_SESSION_MODE, SESSION_MODES, EntityCache, open_session
+from caption_parser import extract_episode_info, parse_filename_for_info
+from download_registry import REGISTRY_PATH, DownloadRegistry, STATUS_COMPLETED, STATUS_DOWNLOADING, STATUS_FAILED
 # from subtitle_generator import SubtitleGenerator (Removed)
 
 import signal
@@ -18,109 +32,70 @@ SESSION_NAME = "series_session"
 TARGET_CHAT = "hosico_catsbot"
 DOWNLOAD_DIR = "downloads/"
 SCAN_LIMIT = None
-MAX_CONCURRENT_DOWNLOADS = 3
-
-# Track active downloads for cleanup: {file_path: percentage}
+MAX_CONCURRENT_DOWNLOADS = 3  # starting point; the adaptive limiter moves it between the bounds below
+MIN_CONCURRENT_DOWNLOADS = 1
+MAX_ADAPTIVE_DOWNLOADS = 8
+CONCURRENCY_WINDOW = 10  # seconds between concurrency adjustments
+FAST_DOWNLOAD_CONNECTIONS = 4  # parallel connections per file (1 = plain sequential download_media)
+# Workers pulling from the scan queue. Workers beyond the download limit wait for a slot,
+# so this is also how far ahead the priority scheduler can look.
+MAX_QUEUE_WORKERS = MAX_ADAPTIVE_DOWNLOADS * 4
+SCAN_QUEUE_SIZE = 50  # max messages buffered between the scanner and the workers
+SCAN_STATE_FILE = "{session}_{chat}.scan.json"  # scan checkpoint per session and chat, next to the session file
+# Optional JSON file mapping sessions to the chats they ingest, e.g.
+#   {"sessions": {"series_session": ["hosico_catsbot"], "second_session": ["otherbot", "thirdbot"]}}
+# Without it, SESSION_NAME ingests TARGET_CHAT.
+INGEST_CONFIG_FILE = "ingest_config.json"
+CHECKPOINT_SAVE_EVERY = 20  # save the checkpoint after this many processed messages
+MANIFEST_FILE = "episode_manifest.jsonl"  # one JSON line per downloaded episode
+DELETE_FLUSH_INTERVAL = 5  # seconds between batched deletions of finished messages
+# Server-side filters for the chat scan. Episodes come as files (documents) or as streamable
+# videos, and Telegram puts those in mostly separate sets; "media" searches both and merges
+# them by id. "document"/"video" only find one kind, "all" disables server-side filtering.
+SCAN_FILTERS = {
+    "media": (InputMessagesFilterDocument, InputMessagesFilterVideo),
+    "all": (None,),
+    "document": (InputMessagesFilterDocument,),
+    "video": (InputMessagesFilterVideo,),
+}
+SCAN_FILTER = "media"
+# Free space always left on the download disk; downloads that don't fit wait for space
+DISK_SAFETY_MARGIN = 2 * 1024 * 1024 * 1024
+PROGRESS_INTERVAL = 10  # seconds between progress reports
+# Which waiting download gets the next free slot: complete_seasons | oldest | newest | smallest
+DOWNLOAD_PRIORITY = "complete_seasons"
+
+# Track active downloads: {file_path: TransferSlot}
 active_downloads = {}
+download_progress = TransferProgress(label="Downloads", interval=PROGRESS_INTERVAL)
+# Folders already created during this run
+_created_dirs = set()
 
 # Subtitle Generation Configuration (Removed)
 # ===========================================
 
-def extract_episode_info(text):
-    info = {}
-    if not text:
-        return info
-
-    # Match the markdown fields as in your example
-    patterns = {
-        "series": r"\*\*○ Series:\*\* `([^`]+)`",
-        "language": r"\*\*○ Language:\*\* `([^`]+)`|○ Language:\s*([^\n`]+)",
-        "resolution": r"\*\*○ Resolution:\*\* `([^`]+)`",
-        "codec": r"\*\*○ Codec:\*\* `([^`]+)`",
-        "episode_title": r"\*\*○ Episode Title:\*\* `([^`]+)`",
-        "episode_number_raw": r"\*\*○ Episode Number:\*\* `([^`]+)`",
-        "released_on": r"\*\*○ Released on:\*\* `([^`]+)`",
-        "rating": r"\*\*○ Episode Rating:\*\* `([^`]+)`",
-    }
-
-    for key, pattern in patterns.items():
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            # group(1) may be None for the Language second alternative; pick the first non-None
-            captured = next((g for g in match.groups() if g), None)
-            if captured:
-                info[key] = captured.strip()
-
-    # parse episode_number_raw like "1/9" -> episode_number, total_episodes_in_season
-    if "episode_number_raw" in info:
-        ep_raw = info["episode_number_raw"]
-        m = re.match(r'(\d+)\s*/\s*(\d+)', ep_raw)
-        if m:
-            info["episode_number"] = m.group(1)
-            info["total_episodes_in_season"] = m.group(2)
-        else:
-            # fallback: take digits
-            digits = re.search(r'(\d+)', ep_raw)
-            if digits:
-                info["episode_number"] = digits.group(1)
-        del info["episode_number_raw"]
-
-    if info.get("series"):
-        info["series"] = info["series"].replace('`', '').strip()
-
-    return info
-
-def parse_filename_for_info(filename):
+async def process_message(client, msg, scheduler, registry, deleter, series_data, downloaded_episodes_tracker, counter_lock, counter_container, source=None, governor=None, account=None):
     """
-    Robust filename parsing:
-    Accepts separators ., _, or spaces.
-    Example matches:
-      Stranger.Things.S04E01.1080p...mkv
-      Stranger_Things_S04E01_...mkv
-      Stranger Things S04E01 ...mkv
-    Returns dict with 'series', 'season_number', 'episode_number' when possible.
+    Downloads the episode attached to `msg`, if any.
+    `source` names the chat the message came from, so the scheduler can share slots fairly between chats.
+    `governor` is the client's FloodGovernor; downloads wait out flood waits through it.
+    `account` names the client's session. The scheduler caps that account's share
+    of the slots with its own AdaptiveLimiter, which alone backs off on its flood waits and errors.
+    Returns False only when a download was attempted and failed, so the scan
+    checkpoint can retry the message on the next run.
     """
-    file_info = {}
-
-    # Normalize filename for matching but keep original for series extraction
-    # Regex:
-    #  - series name: everything up to separator + SXXEYY
-    #  - allow separators '.', '_', or space between tokens
-    pattern = re.compile(r'(.+?)[._\s]S(\d{1,2})E(\d{1,3})(?:[._\s].*)?\.[^.]+$',
-                         re.IGNORECASE)
-    match = pattern.match(filename)
-    if match:
-        raw_series = match.group(1)
-        # replace separators with spaces, then strip and normalize spacing
-        series_clean = re.sub(r'[._\s]+', ' ', raw_series).strip()
-        file_info["series"] = series_clean
-        file_info["season_number"] = match.group(2).zfill(2)  # keep as zero-padded string
-        file_info["episode_number"] = match.group(3).zfill(2)
-        return file_info
-
-    # Try alternate simpler pattern: e.g., "Stranger.Things.S04.E01..."
-    alt = re.compile(r'(.+?)[._\s]S?(\d{1,2})[._\s]E?(\d{1,3}).*\.[^.]+$', re.IGNORECASE)
-    m2 = alt.match(filename)
-    if m2:
-        raw_series = m2.group(1)
-        series_clean = re.sub(r'[._\s]+', ' ', raw_series).strip()
-        file_info["series"] = series_clean
-        file_info["season_number"] = m2.group(2).zfill(2)
-        file_info["episode_number"] = m2.group(3).zfill(2)
-    # Try alternate simpler pattern: e.g., "Stranger.Things.S04.E01..."
-    alt = re.compile(r'(.+?)[._\s]S?(\d{1,2})[._\s]E?(\d{1,3}).*\.[^.]+$', re.IGNORECASE)
-    m2 = alt.match(filename)
-    if m2:
-        raw_series = m2.group(1)
-        series_clean = re.sub(r'[._\s]+', ' ', raw_series).strip()
-        file_info["series"] = series_clean
-        file_info["season_number"] = m2.group(2).zfill(2)
-        file_info["episode_number"] = m2.group(3).zfill(2)
-    return file_info
-
-async def process_message(client, msg, semaphore, series_data, downloaded_episodes_tracker, counter_lock, counter_container):
+    limiter = scheduler.limiter
+    account_limiter = scheduler.accounts.get(account)
+    governor = governor or FloodGovernor()
     if not msg.media or not hasattr(msg.media, 'document') or not msg.media.document:
-        return
+        return True
+
+    document = msg.media.document
+
+    # The bot often reposts the same file; if this document was already downloaded, stop here
+    if registry.is_duplicate_document(document.id, document.size):
+        print(f"⏩ Skipping message {msg.id}: duplicate of an already downloaded file.")
+        return True
 
     # print(f"\n--- Processing message {msg.id} ---") # Reduced logging
 
@@ -151,7 +126,7 @@ async def process_message(client, msg, semaphore, series_data, downloaded_episod
     # If info lacks episode or series, skip
     if not info.get("series") or not info.get("episode_number"):
         # print(f"⚠️ Skipping message {msg.id} (missing series or episode info).")
-        return
+        return True
 
     series_name = info["series"].strip()
     # episode_number may be zero-padded, convert to int
@@ -159,7 +134,7 @@ async def process_message(client, msg, semaphore, series_data, downloaded_episod
         episode_num = int(re.sub(r'\D', '', info["episode_number"]))
     except Exception:
         # print(f"⚠️ Skipping message {msg.id} (invalid episode number: {info.get('episode_number')}).")
-        return
+        return True
 
     # Determine season number:
     if info.get("season_number"):
@@ -180,7 +155,9 @@ async def process_message(client, msg, semaphore, series_data, downloaded_episod
 
     if info.get("total_episodes_in_season"):
         try:
-            downloaded_episodes_tracker[series_name][season_num_str]["total_expected"] = int(info["total_episodes_in_season"])
+            total_expected = int(info["total_episodes_in_season"])
+            downloaded_episodes_tracker[series_name][season_num_str]["total_expected"] = total_expected
+            registry.set_season_total(series_name, season_num_str, total_expected)
         except Exception:
             pass
 
@@ -192,7 +169,6 @@ async def process_message(client, msg, semaphore, series_data, downloaded_episod
 
     local_series_folder = os.path.join(DOWNLOAD_DIR, series_clean)
     local_season_folder = os.path.join(local_series_folder, season_folder_name)
-    os.makedirs(local_season_folder, exist_ok=True)
 
     # determine extension from document attributes if present
     file_ext = ".mkv"
@@ -207,59 +183,108 @@ async def process_message(client, msg, semaphore, series_data, downloaded_episod
     full_file_name = f"{file_name_prefix}{file_ext}"
     local_file_path = os.path.join(local_season_folder, full_file_name)
 
-    if os.path.exists(local_file_path):
-        print(f"⏩ Skipping '{full_file_name}': Exists.")
+    if registry.is_downloaded(series_name, season_num_str, episode_num):
+        print(f"⏩ Skipping '{full_file_name}': Already downloaded.")
         downloaded_episodes_tracker[series_name][season_num_str]["episodes"].add(episode_num)
-        return
+        return True
+
+    episode_key = (series_name, season_num_str, episode_num)
+    if not registry.reserve(document.id, episode_key):
+        print(f"⏩ Skipping '{full_file_name}': already being downloaded from another message.")
+        return True
 
     # Only attempt to download if the document mime looks like a video/matroska or generic video
     try:
-        mime = getattr(msg.media.document, 'mime_type', '') or ''
-        if 'matroska' in mime.lower() or mime.lower().startswith('video/'):
-            async with semaphore:
+        if is_video_document(document):
+            # Files downloaded before the registry existed: adopt them instead of downloading again
+            if os.path.exists(local_file_path):
+                print(f"⏩ Skipping '{full_file_name}': Exists.")
+                registry.record(
+                    series_name, season_num_str, episode_num, STATUS_COMPLETED,
+                    document_id=document.id, message_id=msg.id,
+                    path=local_file_path, size=os.path.getsize(local_file_path)
+                )
+                downloaded_episodes_tracker[series_name][season_num_str]["episodes"].add(episode_num)
+                return True
+
+            ensure_dir(local_season_folder)
+            job = {
+                "msg_id": msg.id,
+                "series": series_name,
+                "season": season_num_str,
+                "episode": episode_num,
+                "size": document.size,
+                "total": downloaded_episodes_tracker[series_name][season_num_str]["total_expected"],
+                "source": source,
+                "account": account,
+                # Already on disk from an interrupted run; not reserved again
+                "resumed": fast_download.resumed_bytes(local_file_path, document),
+            }
+            # Don't take a download slot while this account is sitting out a flood wait
+            await governor.wait("download")
+            async with scheduler.slot(job) as reservation:
+                registry.record(
+                    series_name, season_num_str, episode_num, STATUS_DOWNLOADING,
+                    document_id=document.id, message_id=msg.id, path=local_file_path, size=document.size
+                )
                 print(f"⬇️  Downloading '{full_file_name}'...")
                 
-                # Progress callback closure
-                last_reported = [-1]
-                active_downloads[local_file_path] = 0
+                # Progress goes into a shared slot; the reporter thread prints rates and ETAs
+                slot = download_progress.open(full_file_name, document.size)
+                active_downloads[local_file_path] = slot
+                last_current = [None]
+                # Hashes chunks as they are written, so the file never has to be read back
+                hasher = StreamHasher()
 
                 def progress_callback(current, total):
-                    if not total: return
-                    percentage = int((current / total) * 100)
-                    active_downloads[local_file_path] = percentage
-                    # Report every 10%
-                    if percentage // 10 > last_reported[0] // 10:
-                        print(f"   ⏳ {full_file_name}: {percentage}%")
-                        last_reported[0] = percentage
-                    elif percentage == 100 and last_reported[0] != 100:
-                        print(f"   ⏳ {full_file_name}: 100%")
-                        last_reported[0] = 100
+                    slot.update(current, total)
+                    # Feed the bytes received since the last call into the concurrency controller
+                    # and the disk reservation. The first call only sets the baseline (it may include resumed bytes).
+                    if last_current[0] is not None:
+                        limiter.record_bytes(current - last_current[0])
+                        if account_limiter is not None:
+                            account_limiter.record_bytes(current - last_current[0])
+                        if reservation is not None:
+                            reservation.consume(current - last_current[0])
+                    last_current[0] = current
 
                 try:
-                    file_path = await client.download_media(
+                    # A retry after a flood wait resumes from the .part file
+                    file_path = await governor.call(
+                        "download",
+                        fast_download.download_media,
+                        client,
                         msg,
-                        file=local_file_path,
-                        progress_callback=progress_callback
+                        local_file_path,
+                        progress_callback=progress_callback,
+                        connections=FAST_DOWNLOAD_CONNECTIONS,
+                        hasher=hasher
                     )
                 except (asyncio.CancelledError, KeyboardInterrupt):
-                    if local_file_path in active_downloads and active_downloads[local_file_path] < 100:
-                        if os.path.exists(local_file_path):
-                            print(f"🗑️ Deleting incomplete file: {full_file_name} ({active_downloads[local_file_path]}%)")
-                            os.remove(local_file_path)
+                    if slot.percent < 100:
+                        # The .part file and its sidecar are kept so the next run resumes from here
+                        print(f"⏸️ Interrupted '{full_file_name}' at {slot.percent}%, will resume next run")
+                    raise
+                except Exception:
+                    registry.record(
+                        series_name, season_num_str, episode_num, STATUS_FAILED,
+                        document_id=document.id, message_id=msg.id, path=local_file_path, size=document.size
+                    )
                     raise
 
                 if file_path:
-                    # mark as fully downloaded
-                    active_downloads[local_file_path] = 100
-                    print(f"✅ Finished '{full_file_name}'")
+                    checksum = hasher.hexdigest()
+                    print(f"✅ Finished '{full_file_name}' ({checksum})")
+                    registry.record(
+                        series_name, season_num_str, episode_num, STATUS_COMPLETED,
+                        document_id=document.id, message_id=msg.id, path=local_file_path, size=document.size,
+                        checksum=checksum
+                    )
                     
                     # Subtitle Generation and Burning (Removed)
                     
-                    try:
-                        await msg.delete()
-                        print(f"🗑️ Deleted message {msg.id}")
-                    except Exception as e:
-                        print(f"⚠️ Failed to delete message {msg.id}: {e}")
+                    # Deleted later in a batch, off the download path
+                    deleter.add(msg.id)
                     info["file"] = os.path.basename(file_path)
 
                     # update series_data structure
@@ -276,6 +301,19 @@ async def process_message(client, msg, semaphore, series_data, downloaded_episod
 
                     series_data["series"][series_name]["seasons"][season_num_str]["episodes"].append(info)
 
+                    # Persist the parsed episode right away for downstream tools
+                    try:
+                        append_episode({
+                            **info,
+                            "message_id": msg.id,
+                            "document_id": document.id,
+                            "size": document.size,
+                            "checksum": checksum,
+                            "path": local_file_path,
+                        }, MANIFEST_FILE)
+                    except OSError as e:
+                        print(f"⚠️ Failed to write manifest entry for '{full_file_name}': {e}")
+
                     # tracker add
                     downloaded_episodes_tracker[series_name][season_num_str]["episodes"].add(episode_num)
                     if info.get("total_episodes_in_season"):
@@ -288,115 +326,369 @@ async def process_message(client, msg, semaphore, series_data, downloaded_episod
                         counter_container[0] += 1
                 else:
                     print(f"⚠️ Failed '{full_file_name}'")
+                    registry.record(
+                        series_name, season_num_str, episode_num, STATUS_FAILED,
+                        document_id=document.id, message_id=msg.id, path=local_file_path, size=document.size
+                    )
+                    return False
         else:
             # print(f"   ⚠️ Skipping message {msg.id}: Not a video (mime='{mime}').")
             pass
+        return True
     except (asyncio.CancelledError, KeyboardInterrupt):
         # Already handled download cleanup above, but re-raise to stop other tasks
         raise
+    except errors.FloodWaitError as fw:
+        # The governor already paused downloads and told the limiter; retries ran out
+        print(f"   ⚠️ FloodWait ({fw.seconds}s) for {full_file_name}")
+        return False
     except errors.RPCError as rpc:
         print(f"   ⚠️ RPC error for {full_file_name}:", rpc)
+        (account_limiter or limiter).on_error(rpc)
+        return False
     except Exception as ex:
         print(f"   ⚠️ Failed to download {full_file_name}:", ex)
+        return False
     finally:
-        if local_file_path in active_downloads:
-            del active_downloads[local_file_path]
-
-async def main():
-    os.makedirs(DOWNLOAD_DIR, exist_ok=True)
-    # receive_updates=False is crucial to avoid PersistentTimestampOutdatedError in scraping scripts
-    client = TelegramClient(SESSION_NAME, API_ID, API_HASH, receive_updates=False)
-
-    print("🚀 Starting Telegram client...")
-    await client.start()
-    me = await client.get_me()
-    print("✅ Logged in as:", getattr(me, 'username', me.first_name if me else 'Unknown'))
-
-    try:
-        target = await client.get_entity(TARGET_CHAT)
-    except Exception as e:
-        print(f"❌ Could not resolve '{TARGET_CHAT}': {e}")
-        await client.disconnect()
-        return
-
-    print("📥 Scanning chat:", getattr(target, "title", TARGET_CHAT))
-    series_data = {"series": {}}
-    downloaded_episodes_tracker = {}  # {series: {season_str: {"episodes": set(int), "total_expected": int|None}}}
-    
-    # Shared mutable container for count
-    counter_container = [0]
-    counter_lock = asyncio.Lock()
-
-    all_messages = []
-    
+        registry.release(document.id, episode_key)
+        slot = active_downloads.pop(local_file_path, None)
+        if slot is not None:
+            download_progress.close(slot)
+
+def is_video_document(document):
+    """True if the document's mime type looks like a video/matroska or generic video."""
+    mime = (getattr(document, 'mime_type', '') or '').lower()
+    return 'matroska' in mime or mime.startswith('video/')
+
+def is_candidate_message(msg):
+    """Cheap pre-check run by the scanner so chatter never reaches the download queue."""
+    media = msg.media
+    document = getattr(media, 'document', None) if media else None
+    return document is not None and is_video_document(document)
+
+def ensure_dir(path):
+    """os.makedirs with a memo, so each season folder is created at most once per run."""
+    if path not in _created_dirs:
+        os.makedirs(path, exist_ok=True)
+        _created_dirs.add(path)
+
+async def iter_scan_messages(client, target, min_id, message_filters):
+    """
+    Yields the messages newer than `min_id` that match any of `message_filters`,
+    oldest first. Every filter is its own server-side search; the results are
+    merged by id, so a message matching several filters is yielded once.
+    """
+    streams = [
+        client.iter_messages(target, limit=SCAN_LIMIT, reverse=True, min_id=min_id, filter=message_filter).__aiter__()
+        for message_filter in message_filters
+    ]
+    heads = [await anext(stream, None) for stream in streams]
+    last_id = None
+    while any(head is not None for head in heads):
+        index = min((i for i, head in enumerate(heads) if head is not None), key=lambda i: heads[i].id)
+        msg = heads[index]
+        heads[index] = await anext(streams[index], None)
+        if msg.id != last_id:
+            last_id = msg.id
+            yield msg
+
+async def scan_messages(client, target, queue, checkpoint, scan_filter=SCAN_FILTER, label=TARGET_CHAT, session_name=SESSION_NAME,
+                        governor=None):
+    """
+    Streams the chat history into `queue`, oldest message first, so that
+    S01E01 is queued before S01E02. Only messages newer than the checkpoint
+    watermark are fetched, and `scan_filter` lets Telegram drop non-media
+    messages server-side. Flood waits are sat out through `governor`, then
+    the scan continues after the last message it queued. Returns the number
+    of messages scanned, or None if the scan had to be aborted.
+    """
+    message_filters = SCAN_FILTERS[scan_filter]
     # Retry mechanism for PersistentTimestampOutdatedError
     max_retries = 3
     retry_delay = 5
-    
-    for attempt in range(max_retries):
+
+    scanned = 0
+    last_id = checkpoint.last_message_id  # resume point, also used if the scan is retried
+    governor = governor or FloodGovernor(label=session_name)
+    flood_retries = 0
+
+    attempt = 0
+    while attempt < max_retries:
         try:
-            print(f"📥 Scanning chat: {getattr(target, 'title', TARGET_CHAT)} (Attempt {attempt + 1}/{max_retries})")
-            async for msg in client.iter_messages(target, limit=SCAN_LIMIT):
-                all_messages.append(msg)
-            break # Success, exit retry loop
+            print(f"📥 Scanning chat: {label} (Attempt {attempt + 1}/{max_retries})")
+            async for msg in iter_scan_messages(client, target, last_id, message_filters):
+                last_id = msg.id
+                scanned += 1
+                if checkpoint.is_completed(msg.id) or not is_candidate_message(msg):
+                    checkpoint.seen(msg.id)
+                    continue
+                checkpoint.start(msg.id)
+                await queue.put(msg)
+            return scanned
+        except errors.FloodWaitError as e:
+            if not await governor.backoff("history", e, flood_retries):
+                return None
+            flood_retries += 1
         except errors.PersistentTimestampOutdatedError as e:
-            print(f"⚠️ Telegram internal issue (PTS outdated): {e}")
+            print(f"⚠️ Telegram internal issue (PTS outdated) on {session_name}: {e}")
             if attempt < max_retries - 1:
                 print(f"🔄 Attempting to re-sync session state (Attempt {attempt + 1})...")
                 # Clean reconnection sometimes helps refreshing the internal state
                 await client.disconnect()
                 await asyncio.sleep(retry_delay)
                 await client.start()
-                
+
                 # Forced sync by getting dialogs - this often refreshes the internal state (pts/qts)
                 print("⏳ Fetching dialogs to refresh state...")
-                await client.get_dialogs(limit=20)
+                await governor.call("resolve", client.get_dialogs, limit=20)
                 await asyncio.sleep(2)
+                attempt += 1
             else:
                 print("❌ PersistentTimestampOutdatedError persisted after multiple retries.")
-                print("💡 Suggestion: Try deleting the 'series_session.session' file and re-logging if this error continues.")
-                await client.disconnect()
-                return
+                print(f"💡 Suggestion: Try deleting the '{session_name}.session' file and re-logging if this error continues.")
+                return None
         except Exception as e:
-            print(f"❌ Unexpected error during scan: {e}")
-            await client.disconnect()
-            return
+            print(f"❌ Unexpected error during scan of {label}: {e}")
+            return None
+    return None
 
-    all_messages.sort(key=lambda m: m.id)
-
-    print(f"Found {len(all_messages)} messages. Processing...")
+def load_ingest_config(path=INGEST_CONFIG_FILE):
+    """
+    Returns {session_name: [chat, ...]} from the ingest config file, or
+    {SESSION_NAME: [TARGET_CHAT]} when there is no config file.
+    A chat listed under several sessions is only ingested by the first one.
+    """
+    if not path or not os.path.exists(path):
+        return {SESSION_NAME: [TARGET_CHAT]}
+
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+
+    sessions = {}
+    assigned = {}
+    for session_name, chats in (config.get("sessions") or {}).items():
+        if not isinstance(chats, list):
+            chats = [chats]
+        for chat in chats:
+            if chat in assigned:
+                print(f"⚠️ '{chat}' is listed for both {assigned[chat]} and {session_name}; using {assigned[chat]}")
+                continue
+            assigned[chat] = session_name
+            sessions.setdefault(session_name, []).append(chat)
+    if not sessions:
+        raise ValueError(f"{path} does not list any chats under \"sessions\"")
+    return sessions
+
+async def start_sources(sessions, session_mode=DEFAULT_SESSION_MODE):
+    """
+    Starts one TelegramClient (with its FloodGovernor) per session and resolves its chats.
+    Chats seen on earlier runs come from the session's EntityCache without a round trip.
+    Returns (clients, sources): clients are {"session", "client", "governor"}
+    dicts, and a source is a dict describing one chat to ingest.
+    """
+    clients = []
+    sources = []
+    for session_name, chats in sessions.items():
+        # receive_updates=False is crucial to avoid PersistentTimestampOutdatedError in scraping scripts.
+        # flood_sleep_threshold=0: every flood wait goes to the governor instead of a silent per-request sleep.
+        client = TelegramClient(open_session(session_name, session_mode), API_ID, API_HASH,
+                                receive_updates=False, flood_sleep_threshold=0)
+        governor = FloodGovernor(label=session_name)
+        entities = EntityCache(session_name).load()
+        print(f"🚀 Starting Telegram client '{session_name}'...")
+        await client.start()
+        clients.append({"session": session_name, "client": client, "governor": governor})
+        print(f"✅ {session_name} logged in as:", await entities.resolve_me(client, governor))
+
+        for chat in chats:
+            try:
+                target, label = await entities.resolve(client, chat, governor)
+            except Exception as e:
+                print(f"❌ Could not resolve '{chat}' on {session_name}: {e}")
+                continue
+            sources.append({
+                "session": session_name,
+                "chat": chat,
+                "label": label,
+                "client": client,
+                "governor": governor,
+                "target": target,
+            })
+    return clients, sources
+
+async def main(full_scan=False, scan_filter=SCAN_FILTER, priority=DOWNLOAD_PRIORITY, config_path=INGEST_CONFIG_FILE,
+               session_mode=DEFAULT_SESSION_MODE, redownload_missing=False):
+    os.makedirs(DOWNLOAD_DIR, exist_ok=True)
+    clients, sources = await start_sources(load_ingest_config(config_path), session_mode)
+    if not sources:
+        print("❌ No chat could be resolved, nothing to ingest.")
+        for session in clients:
+            await session["client"].disconnect()
+        return
 
-    semaphore = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+    print(f"📥 Ingesting {len(sources)} chat(s) with {len(clients)} session(s):",
+          ", ".join(f"{source['label']} ({source['session']})" for source in sources))
+    series_data = {"series": {}}
+    registry = DownloadRegistry(REGISTRY_PATH).load()
+    print(f"📚 Registry: {len(registry.by_episode)} known episodes")
+    if redownload_missing:
+        missing = registry.mark_missing_files()
+        print(f"♻️ {missing} downloaded episode(s) no longer on disk will be downloaded again")
+    # {series: {season_str: {"episodes": set(int), "total_expected": int|None}}}, restored from the registry
+    downloaded_episodes_tracker = registry.build_tracker()
     
-    # Process all messages concurrently, limited by semaphore
-    tasks = []
-    for msg in all_messages:
-        task = asyncio.create_task(
-            process_message(
-                client, 
-                msg, 
-                semaphore, 
-                series_data, 
-                downloaded_episodes_tracker, 
-                counter_lock, 
-                counter_container
-            )
+    # Shared mutable container for count
+    counter_container = [0]
+    counter_lock = asyncio.Lock()
+
+    # One download budget for every chat and session; the scheduler takes turns between chats
+    limiter = AdaptiveLimiter(
+        initial=MAX_CONCURRENT_DOWNLOADS,
+        min_limit=MIN_CONCURRENT_DOWNLOADS,
+        max_limit=MAX_ADAPTIVE_DOWNLOADS,
+        window=CONCURRENCY_WINDOW
+    )
+    limiter_tasks = [asyncio.create_task(limiter.run())]
+    for session in clients:
+        # Each account backs off on its own flood waits; the other accounts keep their share
+        session["limiter"] = AdaptiveLimiter(
+            initial=MAX_CONCURRENT_DOWNLOADS,
+            min_limit=MIN_CONCURRENT_DOWNLOADS,
+            max_limit=MAX_ADAPTIVE_DOWNLOADS,
+            window=CONCURRENCY_WINDOW
         )
-        tasks.append(task)
-    
-    if tasks:
+        session["governor"].on_flood_wait = session["limiter"].on_flood_wait
+        limiter_tasks.append(asyncio.create_task(session["limiter"].run()))
+    account_limiters = {session["session"]: session["limiter"] for session in clients}
+    download_progress.start_reporter()
+    budget = DiskBudget(DOWNLOAD_DIR, margin=DISK_SAFETY_MARGIN)
+    scheduler = DownloadScheduler(
+        limiter, downloaded_episodes_tracker, policy=priority, budget=budget, accounts=account_limiters
+    ).start()
+    print(f"📋 Download priority: {priority}")
+
+    for source in sources:
+        checkpoint = ScanCheckpoint(SCAN_STATE_FILE.format(session=source["session"], chat=source["chat"])).load()
+        if full_scan:
+            checkpoint.reset()
+        elif checkpoint.last_message_id:
+            print(f"⏩ {source['label']}: resuming scan after message {checkpoint.last_message_id}")
+        source["checkpoint"] = checkpoint
+        source["finished_since_save"] = 0
+        source["deleter"] = DeletionBatcher(
+            source["client"], source["target"], flush_interval=DELETE_FLUSH_INTERVAL, governor=source["governor"]
+        ).start()
+    if full_scan:
+        print("🔁 Full rescan requested, ignoring saved scan positions.")
+
+    async def worker(source, queue):
+        checkpoint = source["checkpoint"]
+        while True:
+            msg = await queue.get()
+            ok = False
+            interrupted = False
+            try:
+                if msg is None:
+                    return
+                ok = await process_message(
+                    source["client"],
+                    msg,
+                    scheduler,
+                    registry,
+                    source["deleter"],
+                    series_data,
+                    downloaded_episodes_tracker,
+                    counter_lock,
+                    counter_container,
+                    source=source["chat"],
+                    governor=source["governor"],
+                    account=source["session"]
+                )
+            except (asyncio.CancelledError, KeyboardInterrupt):
+                # Not a failed attempt: the message stays in flight and is picked up again next run
+                interrupted = True
+                raise
+            except Exception as e:
+                # Keep the worker alive; one bad message must not stall the pipeline
+                print(f"⚠️ Error processing message {getattr(msg, 'id', '?')} from {source['label']}: {e}")
+            finally:
+                if msg is not None and not interrupted:
+                    checkpoint.finish(msg.id, ok)
+                    source["finished_since_save"] += 1
+                    if source["finished_since_save"] >= CHECKPOINT_SAVE_EVERY:
+                        checkpoint.save()
+                        source["finished_since_save"] = 0
+                queue.task_done()
+
+    async def ingest(source):
+        # Bounded queue between this chat's scanner and its workers.
+        # When it is full the scanner blocks, so the scan never runs far ahead of the downloads.
+        queue = asyncio.Queue(maxsize=SCAN_QUEUE_SIZE)
+        workers = [asyncio.create_task(worker(source, queue)) for _ in range(MAX_QUEUE_WORKERS)]
         try:
-            await asyncio.gather(*tasks)
-        except (asyncio.CancelledError, KeyboardInterrupt):
-            print("\n🛑 Interrupted! Cleaning up...")
-            # The individual process_message tasks handle their own cleanup
-            for t in tasks:
-                t.cancel()
-            await asyncio.gather(*tasks, return_exceptions=True)
+            scanned = await scan_messages(
+                source["client"], source["target"], queue, source["checkpoint"], scan_filter,
+                label=source["label"], session_name=source["session"], governor=source["governor"]
+            )
+            if scanned is not None:
+                print(f"Scanned {scanned} messages in {source['label']}. Waiting for its downloads to finish...")
+            # One sentinel per worker so every worker exits once the queue drains
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            # The individual process_message calls handle their own cleanup
+            for w in workers:
+                w.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
 
+    try:
+        await asyncio.gather(*(ingest(source) for source in sources))
+    except (asyncio.CancelledError, KeyboardInterrupt):
+        print("\n🛑 Interrupted! Cleaning up...")
+    finally:
+        for task in limiter_tasks:
+            task.cancel()
+        download_progress.stop_reporter()
+        await scheduler.close()
+        for source in sources:
+            await source["deleter"].close()
+            source["checkpoint"].save()
+        registry.close()
 
     print(f"\n🎉 Completed. Total episodes downloaded: {counter_container[0]}")
-    await client.disconnect()
+    stats = limiter.snapshot()
+    print(f"⚙️  Final download concurrency: {stats['limit']} "
+          f"(last window {stats['throughput_bps'] / (1024 * 1024):.1f} MB/s)")
+    for session in clients:
+        account = session["limiter"].snapshot()
+        print(f"⚙️  {session['session']}: concurrency {account['limit']}, "
+              f"{account['flood_waits']} flood waits, {account['errors']} RPC errors")
+        flood = session["governor"].snapshot()
+        if flood["flood_waits"]:
+            by_method = ", ".join(f"{method}: {entry['lost_seconds']:.0f}s" for method, entry in flood["by_method"].items())
+            print(f"⏳ {session['session']}: {flood['flood_waits']} flood waits, "
+                  f"{flood['lost_seconds']:.0f}s lost ({by_method})")
+        await session["client"].disconnect()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    import argparse
+    parser = argparse.ArgumentParser(description="Download series episodes from a Telegram chat")
+    parser.add_argument("--full-scan", action="store_true", help="Ignore the saved scan position and rescan the whole chat")
+    parser.add_argument("--scan-filter", choices=sorted(SCAN_FILTERS), default=SCAN_FILTER,
+                        help="Server-side message filter used while scanning (default: %(default)s)")
+    parser.add_argument("--priority", choices=sorted(PRIORITY_POLICIES), default=DOWNLOAD_PRIORITY,
+                        help="Order in which waiting downloads get a slot (default: %(default)s)")
+    parser.add_argument("--config", default=INGEST_CONFIG_FILE,
+                        help="JSON file mapping sessions to chats (default: %(default)s; "
+                             "without it SESSION_NAME ingests TARGET_CHAT)")
+    parser.add_argument("--session-mode", choices=SESSION_MODES, default=DEFAULT_SESSION_MODE,
+                        help="file: SQLite session file; memory/string: don't hold the session file open "
+                             "(default: %(default)s, or $TELEGRAM_SESSION_MODE)")
+    parser.add_argument("--redownload-missing", action="store_true",
+                        help="Download again episodes whose file was deleted without being uploaded "
+                             "(combine with --full-scan to reach older messages)")
+    args = parser.parse_args()
+    asyncio.run(main(full_scan=args.full_scan, scan_filter=args.scan_filter, priority=args.priority,
+                     config_path=args.config, session_mode=args.session_mode,
+                     redownload_missing=args.redownload_missing))
@@ -0,0 +1,172 @@
+"""
+Micro-benchmark for caption_parser against the per-field regex parsers it replaced.
+
+Builds a corpus of bot captions and file names from the titles in
+filemoon_files.csv (plus a few hand-picked edge cases), checks that both
+implementations return identical dicts, then times them.
+
+    python bench_caption_parser.py [--rounds 20]
+"""
+import argparse
+import csv
+import os
+import re
+import timeit
+
+from caption_parser import extract_episode_info, parse_filename_for_info
+
+CSV_FILE = "filemoon_files.csv"
+
+
+def legacy_extract_episode_info(text):
+    info = {}
+    if not text:
+        return info
+
+    patterns = {
+        "series": r"\*\*○ Series:\*\* `([^`]+)`",
+        "language": r"\*\*○ Language:\*\* `([^`]+)`|○ Language:\s*([^\n`]+)",
+        "resolution": r"\*\*○ Resolution:\*\* `([^`]+)`",
+        "codec": r"\*\*○ Codec:\*\* `([^`]+)`",
+        "episode_title": r"\*\*○ Episode Title:\*\* `([^`]+)`",
+        "episode_number_raw": r"\*\*○ Episode Number:\*\* `([^`]+)`",
+        "released_on": r"\*\*○ Released on:\*\* `([^`]+)`",
+        "rating": r"\*\*○ Episode Rating:\*\* `([^`]+)`",
+    }
+
+    for key, pattern in patterns.items():
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            captured = next((g for g in match.groups() if g), None)
+            if captured:
+                info[key] = captured.strip()
+
+    if "episode_number_raw" in info:
+        ep_raw = info["episode_number_raw"]
+        m = re.match(r'(\d+)\s*/\s*(\d+)', ep_raw)
+        if m:
+            info["episode_number"] = m.group(1)
+            info["total_episodes_in_season"] = m.group(2)
+        else:
+            digits = re.search(r'(\d+)', ep_raw)
+            if digits:
+                info["episode_number"] = digits.group(1)
+        del info["episode_number_raw"]
+
+    if info.get("series"):
+        info["series"] = info["series"].replace('`', '').strip()
+
+    return info
+
+
+def legacy_parse_filename_for_info(filename):
+    file_info = {}
+    pattern = re.compile(r'(.+?)[._\s]S(\d{1,2})E(\d{1,3})(?:[._\s].*)?\.[^.]+$',
+                         re.IGNORECASE)
+    match = pattern.match(filename)
+    if match:
+        raw_series = match.group(1)
+        series_clean = re.sub(r'[._\s]+', ' ', raw_series).strip()
+        file_info["series"] = series_clean
+        file_info["season_number"] = match.group(2).zfill(2)
+        file_info["episode_number"] = match.group(3).zfill(2)
+        return file_info
+
+    for _ in range(2):  # the fallback block ran twice
+        alt = re.compile(r'(.+?)[._\s]S?(\d{1,2})[._\s]E?(\d{1,3}).*\.[^.]+$', re.IGNORECASE)
+        m2 = alt.match(filename)
+        if m2:
+            raw_series = m2.group(1)
+            series_clean = re.sub(r'[._\s]+', ' ', raw_series).strip()
+            file_info["series"] = series_clean
+            file_info["season_number"] = m2.group(2).zfill(2)
+            file_info["episode_number"] = m2.group(3).zfill(2)
+    return file_info
+
+
+CAPTION_TEMPLATE = (
+    "**○ Series:** `{series}`\n"
+    "**○ Language:** `Hindi + English`\n"
+    "**○ Resolution:** `1080p`\n"
+    "**○ Codec:** `x265 10bit`\n"
+    "**○ Episode Title:** `{title}`\n"
+    "**○ Episode Number:** `{episode}/{total}`\n"
+    "**○ Released on:** `2019-07-04`\n"
+    "**○ Episode Rating:** `8.4/10`\n\n"
+    "__Join @channel for more__"
+)
+
+EDGE_CAPTIONS = [
+    "",
+    "No metadata here, just a plain message.",
+    "**○ Series:** `Dark`\n○ Language: German (Dubbed)\n**○ Episode Number:** `Episode 7`",
+    "**○ SERIES:** `Dark`\n**○ series:** `Second`\n**○ Episode Number:** `3 / 10`",
+    "**○ Series:** `  `\n**○ Codec:** ` HEVC `",
+    "○ Language: Hindi **○ Series:** `Swallowed`\n**○ Resolution:** `720p`",
+    "**○ Series:** `Unterminated\n**○ Language:** `English`\n**○ Codec:** `AV1`",
+    "**○ Language:** Hindi\n**○ Episode Number:** `no digits`",
+]
+
+EDGE_FILENAMES = [
+    "Stranger.Things.S04E01.1080p.WEB.mkv",
+    "Stranger_Things_S04E01_720p.mkv",
+    "Stranger Things S04E01 HDR.mp4",
+    "Stranger.Things.S04.E01.mkv",
+    "Stranger.Things.04.01.mkv",
+    "Movie.2019.1080p.mkv",
+    "no_extension_S01E01",
+]
+
+
+def build_corpus():
+    titles = []
+    if os.path.exists(CSV_FILE):
+        with open(CSV_FILE, newline='', encoding='utf-8') as f:
+            titles = [row["title"] for row in csv.DictReader(f) if row.get("title")]
+    captions = list(EDGE_CAPTIONS)
+    filenames = list(EDGE_FILENAMES)
+    for i, title in enumerate(titles):
+        m = re.search(r'(.*?)\s*S(\d+)E(\d+)', title, re.IGNORECASE)
+        series, episode = (m.group(1), int(m.group(3))) if m else (title, i % 12 + 1)
+        captions.append(CAPTION_TEMPLATE.format(series=series, title=f"Chapter {episode}", episode=episode, total=12))
+        separator = "._ "[i % 3]
+        filenames.append(title.replace(" ", separator) + f"{separator}1080p{separator}WEB-DL.mkv")
+    return captions, filenames
+
+
+def check(captions, filenames):
+    for text in captions:
+        new, old = extract_episode_info(text), legacy_extract_episode_info(text)
+        assert new == old and list(new) == list(old), f"caption mismatch:\n{text!r}\n{new}\n{old}"
+    for name in filenames:
+        new, old = parse_filename_for_info(name), legacy_parse_filename_for_info(name)
+        assert new == old, f"filename mismatch: {name!r}\n{new}\n{old}"
+
+
+def bench(label, func, items, rounds):
+    seconds = min(timeit.repeat(lambda: [func(item) for item in items], number=1, repeat=rounds))
+    print(f"   {label}: {seconds * 1e6 / len(items):.2f} µs per item")
+    return seconds
+
+
+def main(rounds=20):
+    captions, filenames = build_corpus()
+    check(captions, filenames)
+    print(f"✅ Identical output on {len(captions)} captions and {len(filenames)} file names")
+
+    print("📝 extract_episode_info")
+    old = bench("legacy", legacy_extract_episode_info, captions, rounds)
+    new = bench("single-pass", extract_episode_info, captions, rounds)
+    print(f"   ⚡ {old / new:.1f}x faster")
+
+    print("🎞️ parse_filename_for_info")
+    old = bench("legacy", legacy_parse_filename_for_info, filenames, rounds)
+    new = bench("precompiled", parse_filename_for_info, filenames, rounds)
+    print(f"   ⚡ {old / new:.1f}x faster")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark caption_parser against the legacy regex parsers.")
+    parser.add_argument("--rounds", type=int, default=20, help="Timing repetitions (best one is reported)")
+    args = parser.parse_args()
+    main(rounds=args.rounds)
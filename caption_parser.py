@@ -0,0 +1,121 @@
+"""
+Metadata parsing for the bot's episode captions and file names.
+
+Captions use the layout `**○ Field:** `value`` with one field per line.
+Instead of one regex search per field, a single precompiled alternation walks
+the caption once and keeps the first value found for each field.
+"""
+import re
+
+# Caption label (lower-cased) -> key in the returned dict, in output order
+CAPTION_FIELDS = {
+    "series": "series",
+    "language": "language",
+    "resolution": "resolution",
+    "codec": "codec",
+    "episode title": "episode_title",
+    "episode number": "episode_number_raw",
+    "released on": "released_on",
+    "episode rating": "rating",
+}
+
+_CAPTION_RE = re.compile(
+    r"\*\*○ (Series|Language|Resolution|Codec|Episode Title|Episode Number|Released on|Episode Rating):\*\* `([^`]+)`"
+    # Plain "○ Language: Hindi" lines, used by some posts
+    r"|○ Language:\s*([^\n`]+)",
+    re.IGNORECASE
+)
+
+# One pattern per field, only for captions the single pass can't read (see _scan_fields)
+_FIELD_RES = {
+    key: re.compile(
+        rf"\*\*○ {label}:\*\* `([^`]+)`" + (r"|○ Language:\s*([^\n`]+)" if key == "language" else ""),
+        re.IGNORECASE
+    )
+    for label, key in CAPTION_FIELDS.items()
+}
+
+_EPISODE_FRACTION_RE = re.compile(r'(\d+)\s*/\s*(\d+)')
+_DIGITS_RE = re.compile(r'(\d+)')
+
+_FILENAME_RE = re.compile(r'(.+?)[._\s]S(\d{1,2})E(\d{1,3})(?:[._\s].*)?\.[^.]+$', re.IGNORECASE)
+_FILENAME_ALT_RE = re.compile(r'(.+?)[._\s]S?(\d{1,2})[._\s]E?(\d{1,3}).*\.[^.]+$', re.IGNORECASE)
+_SEPARATORS_RE = re.compile(r'[._\s]+')
+
+
+def _scan_fields(text):
+    """Returns {key: raw value} with the first (leftmost) value of each caption field."""
+    found = {}
+    for match in _CAPTION_RE.finditer(text):
+        label, value, plain_language = match.groups()
+        if plain_language is not None:
+            key, value = "language", plain_language
+        else:
+            key = CAPTION_FIELDS[label.lower()]
+        if "○" in value:
+            # A malformed value (e.g. a missing closing backtick) ran into the next field
+            # and hid it from the single pass; search field by field instead.
+            return _search_fields(text)
+        if key not in found:
+            found[key] = value
+    return found
+
+
+def _search_fields(text):
+    found = {}
+    for key, pattern in _FIELD_RES.items():
+        match = pattern.search(text)
+        if match:
+            found[key] = next((g for g in match.groups() if g), None)
+    return found
+
+
+def extract_episode_info(text):
+    info = {}
+    if not text:
+        return info
+
+    found = _scan_fields(text)
+    for key in _FIELD_RES:
+        captured = found.get(key)
+        if captured:
+            info[key] = captured.strip()
+
+    # parse episode_number_raw like "1/9" -> episode_number, total_episodes_in_season
+    if "episode_number_raw" in info:
+        ep_raw = info.pop("episode_number_raw")
+        m = _EPISODE_FRACTION_RE.match(ep_raw)
+        if m:
+            info["episode_number"] = m.group(1)
+            info["total_episodes_in_season"] = m.group(2)
+        else:
+            # fallback: take digits
+            digits = _DIGITS_RE.search(ep_raw)
+            if digits:
+                info["episode_number"] = digits.group(1)
+
+    if info.get("series"):
+        info["series"] = info["series"].replace('`', '').strip()
+
+    return info
+
+
+def parse_filename_for_info(filename):
+    """
+    Robust filename parsing:
+    Accepts separators ., _, or spaces.
+    Example matches:
+      Stranger.Things.S04E01.1080p...mkv
+      Stranger_Things_S04E01_...mkv
+      Stranger Things S04E01 ...mkv
+    Returns dict with 'series', 'season_number', 'episode_number' when possible.
+    """
+    # Fall back to the looser pattern, e.g. "Stranger.Things.S04.E01..."
+    match = _FILENAME_RE.match(filename) or _FILENAME_ALT_RE.match(filename)
+    if not match:
+        return {}
+    return {
+        "series": _SEPARATORS_RE.sub(' ', match.group(1)).strip(),
+        "season_number": match.group(2).zfill(2),  # keep as zero-padded string
+        "episode_number": match.group(3).zfill(2),
+    }
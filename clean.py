@@ -2,6 +2,8 @@ import asyncio
 import os
 from telethon import TelegramClient
 from dotenv import load_dotenv
+from flood_governor import FloodGovernor
+from telegram_session import SESSION_MODES, EntityCache, open_session
 
 # Load environment variables
 load_dotenv()
@@ -12,25 +14,35 @@ API_HASH = os.getenv("API_HASH", "b19339ceab122576f62b3886e267f35d")
 SESSION_NAME = "series_session"
 TARGET_CHAT = "hosico_catsbot"  # Change this if you want to clear a different chat
 
-async def clear_history():
+async def clear_history(session_mode="memory"):
     print(f"🚀 Starting Telegram client to clear history for: {TARGET_CHAT}")
     
-    client = TelegramClient(SESSION_NAME, API_ID, API_HASH)
+    # "memory" copies the login out of the session file, so this can run while app.py holds it
+    client = TelegramClient(open_session(SESSION_NAME, session_mode), API_ID, API_HASH, flood_sleep_threshold=0)
+    governor = FloodGovernor(label=SESSION_NAME)
     await client.start()
     
     try:
-        # Get the entity to ensure it's valid
-        entity = await client.get_entity(TARGET_CHAT)
-        print(f"✅ Found chat: {getattr(entity, 'title', entity.username)}")
+        # Resolve the chat (cached by app.py after its first run)
+        entity, label = await EntityCache(SESSION_NAME).load().resolve(client, TARGET_CHAT, governor)
+        print(f"✅ Found chat: {label}")
         
         print("🗑️  Deleting history...")
         # Delete history
-        await client.delete_dialog(entity, revoke=True)
+        await governor.call("delete", client.delete_dialog, entity, revoke=True)
         print("✅ History cleared.")
     except Exception as e:
         print(f"❌ Error: {e}")
     finally:
+        flood = governor.snapshot()
+        if flood["flood_waits"]:
+            print(f"⏳ {flood['flood_waits']} flood waits, {flood['lost_seconds']:.0f}s lost")
         await client.disconnect()
 
 if __name__ == "__main__":
-    asyncio.run(clear_history())
+    import argparse
+    parser = argparse.ArgumentParser(description="Delete the whole history of TARGET_CHAT")
+    parser.add_argument("--session-mode", choices=SESSION_MODES, default="memory",
+                        help="How to open the session (default: %(default)s, doesn't lock the session file)")
+    args = parser.parse_args()
+    asyncio.run(clear_history(session_mode=args.session_mode))
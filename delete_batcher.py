@@ -0,0 +1,78 @@
+import asyncio
+
+# Telegram accepts up to 100 message ids per DeleteMessages request
+MAX_BATCH_SIZE = 100
+
+
+class DeletionBatcher:
+    """
+    Collects ids of messages whose downloads finished and deletes them in
+    batches with `client.delete_messages`, instead of one `msg.delete()`
+    RPC per episode on the download path.
+
+    A batch is flushed when `batch_size` ids are pending or every
+    `flush_interval` seconds, whichever comes first. `close()` flushes
+    whatever is left. With a FloodGovernor, deletions wait out flood waits
+    instead of failing.
+    """
+
+    def __init__(self, client, entity, batch_size=MAX_BATCH_SIZE, flush_interval=5.0, governor=None):
+        self.client = client
+        self.entity = entity
+        self.governor = governor
+        self.batch_size = min(batch_size, MAX_BATCH_SIZE)
+        self.flush_interval = flush_interval
+        self.deleted = 0
+        self.failed = 0
+        self._pending = []
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task = None
+
+    def add(self, msg_id):
+        """Queues a message for deletion. Never blocks."""
+        self._pending.append(msg_id)
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Deletes every pending message, `batch_size` ids per request."""
+        async with self._lock:
+            while self._pending:
+                batch = self._pending[:self.batch_size]
+                del self._pending[:self.batch_size]
+                try:
+                    if self.governor:
+                        await self.governor.call("delete", self.client.delete_messages, self.entity, batch)
+                    else:
+                        await self.client.delete_messages(self.entity, batch)
+                    self.deleted += len(batch)
+                    print(f"🗑️ Deleted {len(batch)} message(s)")
+                except asyncio.CancelledError:
+                    # Put the batch back so close() can still delete it
+                    self._pending[:0] = batch
+                    raise
+                except Exception as e:
+                    self.failed += len(batch)
+                    print(f"⚠️ Failed to delete {len(batch)} message(s): {e}")
+
+    async def close(self):
+        """Stops the timer and flushes the remaining ids."""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
@@ -0,0 +1,50 @@
+import shutil
+
+# Space kept free on the download disk no matter what
+DEFAULT_MARGIN = 2 * 1024 * 1024 * 1024
+
+
+class InsufficientDiskSpace(Exception):
+    """A download that cannot fit in the free space, even with nothing else downloading."""
+
+
+class Reservation:
+    """Disk space held for one download. Shrinks as the bytes actually land on disk."""
+
+    def __init__(self, budget, size):
+        self.budget = budget
+        self.outstanding = size
+
+    def consume(self, count):
+        """Called with bytes written since the last call; they now show up in disk_usage instead."""
+        count = min(count, self.outstanding)
+        self.outstanding -= count
+        self.budget.reserved -= count
+
+    def release(self):
+        self.budget.reserved -= self.outstanding
+        self.outstanding = 0
+
+
+class DiskBudget:
+    """
+    Free-space budget for DOWNLOAD_DIR. A download reserves its document size
+    before it starts, so several large files cannot all be admitted against
+    the same free space and then fail late when the disk fills up.
+    """
+
+    def __init__(self, path, margin=DEFAULT_MARGIN):
+        self.path = path
+        self.margin = margin
+        self.reserved = 0
+
+    def free(self):
+        return shutil.disk_usage(self.path).free
+
+    def available(self):
+        """Bytes that can still be promised to new downloads."""
+        return self.free() - self.reserved - self.margin
+
+    def reserve(self, size):
+        self.reserved += size
+        return Reservation(self, size)
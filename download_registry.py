@@ -0,0 +1,199 @@
+import os
+import sqlite3
+import time
+
+REGISTRY_PATH = "downloads_registry.db"  # persistent index of downloaded episodes
+
+STATUS_DOWNLOADING = "downloading"
+STATUS_COMPLETED = "completed"
+STATUS_FAILED = "failed"
+STATUS_UPLOADED = "uploaded"  # completed and uploaded to FileMoon; the local file is deleted by then
+STATUS_MISSING = "missing"  # was completed, but the file was gone when --redownload-missing was given
+# Entries that count as downloaded for skip decisions
+DONE_STATUSES = (STATUS_COMPLETED, STATUS_UPLOADED)
+
+
+class DownloadRegistry:
+    """
+    Persistent index of downloaded episodes, keyed by (series, season, episode)
+    and by Telegram document id.
+
+    The whole table is loaded into dicts once at startup, so skip decisions in
+    app.process_message are plain memory lookups; SQLite is only written to when
+    an entry changes.
+    """
+
+    def __init__(self, path=REGISTRY_PATH):
+        self.path = path
+        self.conn = None
+        self.by_episode = {}   # {(series, season_str, episode_int): entry}
+        self.by_document = {}  # {document_id: entry}
+        self.season_totals = {}  # {(series, season_str): total_expected}
+        # Downloads running right now, so two messages for the same file or episode never both start
+        self._in_flight_documents = set()
+        self._in_flight_episodes = set()
+
+    def load(self):
+        """Opens the database (creating the tables if needed) and loads every entry into memory."""
+        self.conn = sqlite3.connect(self.path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS downloads (
+                series TEXT NOT NULL,
+                season TEXT NOT NULL,
+                episode INTEGER NOT NULL,
+                document_id INTEGER,
+                message_id INTEGER,
+                path TEXT,
+                size INTEGER,
+                checksum TEXT,
+                status TEXT NOT NULL,
+                updated_at REAL,
+                PRIMARY KEY (series, season, episode)
+            );
+            CREATE INDEX IF NOT EXISTS idx_downloads_document ON downloads (document_id);
+            CREATE TABLE IF NOT EXISTS seasons (
+                series TEXT NOT NULL,
+                season TEXT NOT NULL,
+                total_expected INTEGER,
+                PRIMARY KEY (series, season)
+            );
+        """)
+        columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(downloads)")}
+        if "checksum" not in columns:
+            # Registries created before checksums were recorded
+            self.conn.execute("ALTER TABLE downloads ADD COLUMN checksum TEXT")
+            self.conn.commit()
+        for row in self.conn.execute("SELECT * FROM downloads"):
+            self._index(dict(row))
+        for row in self.conn.execute("SELECT series, season, total_expected FROM seasons"):
+            self.season_totals[(row["series"], row["season"])] = row["total_expected"]
+        return self
+
+    def close(self):
+        if self.conn:
+            self.conn.close()
+            self.conn = None
+
+    def _index(self, entry):
+        self.by_episode[(entry["series"], entry["season"], entry["episode"])] = entry
+        if entry.get("document_id"):
+            self.by_document[entry["document_id"]] = entry
+
+    def get_episode(self, series, season, episode):
+        return self.by_episode.get((series, season, episode))
+
+    def get_document(self, document_id):
+        return self.by_document.get(document_id)
+
+    def is_duplicate_document(self, document_id, size):
+        """True if this exact document (same id and size) was already downloaded."""
+        entry = self.by_document.get(document_id)
+        return bool(entry) and entry["status"] in DONE_STATUSES and entry.get("size") == size
+
+    def reserve(self, document_id, episode_key):
+        """
+        Claims a document and an episode for download. Returns False if either
+        is already being downloaded by another task. Synchronous on purpose:
+        with no await between the check and the claim, asyncio tasks cannot race.
+        """
+        if document_id in self._in_flight_documents or episode_key in self._in_flight_episodes:
+            return False
+        self._in_flight_documents.add(document_id)
+        self._in_flight_episodes.add(episode_key)
+        return True
+
+    def release(self, document_id, episode_key):
+        self._in_flight_documents.discard(document_id)
+        self._in_flight_episodes.discard(episode_key)
+
+    def is_downloaded(self, series, season, episode):
+        entry = self.by_episode.get((series, season, episode))
+        return bool(entry) and entry["status"] in DONE_STATUSES
+
+    def _set_status(self, entry, status):
+        entry["status"] = status
+        entry["updated_at"] = time.time()
+        self.conn.execute(
+            "UPDATE downloads SET status = ?, updated_at = ? WHERE series = ? AND season = ? AND episode = ?",
+            (entry["status"], entry["updated_at"], entry["series"], entry["season"], entry["episode"])
+        )
+        self.conn.commit()
+
+    def mark_uploaded(self, path):
+        """
+        Marks the completed episode downloaded to `path` as uploaded, so it stays
+        skipped after the uploader deletes the local file. Returns False if no
+        completed entry has that path.
+        """
+        path = os.path.normpath(path)
+        for entry in self.by_episode.values():
+            if entry["status"] == STATUS_COMPLETED and entry.get("path") and os.path.normpath(entry["path"]) == path:
+                self._set_status(entry, STATUS_UPLOADED)
+                return True
+        return False
+
+    def mark_missing_files(self):
+        """
+        Marks completed (not uploaded) episodes whose file is gone as missing, so
+        they are downloaded again. Only run on request: it checks every file on disk.
+        """
+        missing = 0
+        for entry in self.by_episode.values():
+            if entry["status"] == STATUS_COMPLETED and entry.get("path") and not os.path.exists(entry["path"]):
+                self._set_status(entry, STATUS_MISSING)
+                missing += 1
+        return missing
+
+    def record(self, series, season, episode, status, document_id=None, message_id=None, path=None, size=None,
+               checksum=None):
+        """Inserts or updates the entry for an episode. `checksum` is a stream_checksum digest, if known."""
+        entry = {
+            "series": series,
+            "season": season,
+            "episode": episode,
+            "document_id": document_id,
+            "message_id": message_id,
+            "path": path,
+            "size": size,
+            "checksum": checksum,
+            "status": status,
+            "updated_at": time.time(),
+        }
+        self.conn.execute(
+            "INSERT OR REPLACE INTO downloads "
+            "(series, season, episode, document_id, message_id, path, size, checksum, status, updated_at) "
+            "VALUES (:series, :season, :episode, :document_id, :message_id, :path, :size, :checksum, :status, :updated_at)",
+            entry
+        )
+        self.conn.commit()
+        previous = self.by_episode.get((series, season, episode))
+        if previous and previous.get("document_id") and previous["document_id"] != document_id:
+            self.by_document.pop(previous["document_id"], None)
+        self._index(entry)
+        return entry
+
+    def set_season_total(self, series, season, total_expected):
+        if self.season_totals.get((series, season)) == total_expected:
+            return
+        self.season_totals[(series, season)] = total_expected
+        self.conn.execute(
+            "INSERT OR REPLACE INTO seasons (series, season, total_expected) VALUES (?, ?, ?)",
+            (series, season, total_expected)
+        )
+        self.conn.commit()
+
+    def build_tracker(self):
+        """
+        Rebuilds the in-memory tracker used by app.py from the registry:
+        {series: {season_str: {"episodes": set(int), "total_expected": int|None}}}
+        """
+        tracker = {}
+        for (series, season), total in self.season_totals.items():
+            tracker.setdefault(series, {})[season] = {"episodes": set(), "total_expected": total}
+        for (series, season, episode), entry in self.by_episode.items():
+            if entry["status"] not in DONE_STATUSES:
+                continue
+            season_entry = tracker.setdefault(series, {}).setdefault(season, {"episodes": set(), "total_expected": None})
+            season_entry["episodes"].add(episode)
+        return tracker
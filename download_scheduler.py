@@ -0,0 +1,244 @@
+"""
+Priority admission for Telegram downloads.
+
+Workers ask the scheduler for a download slot with a small job description.
+Whenever the concurrency limiter has a free slot, the scheduler hands it to
+the waiting job that ranks first under the active policy. Ranks are computed
+at hand-out time, so policies can react to what has been downloaded so far.
+
+A job is a dict with: msg_id, series, season (zero-padded str), episode (int),
+size (bytes), total (expected episodes in the season, or None) and
+optionally source (the chat it came from) and resumed (bytes already in
+its .part file).
+
+When jobs from several sources are waiting, slots go round-robin between
+the sources, and the policy picks the job within the source whose turn it is.
+That way one busy chat cannot starve the others.
+
+A job may also name the account (Telegram session) that downloads it. With
+per-account limiters, jobs whose account has no free slot are left waiting
+and the pick is made among the rest, so an account cap never takes the
+ordering away from the policy.
+
+With a DiskBudget, only jobs whose remaining bytes fit in the free space are
+considered; the rest keep waiting until a download finishes or space is freed.
+Once nothing is downloading and they still don't fit after DISK_WAIT_TIMEOUT,
+their slot() raises InsufficientDiskSpace instead of waiting forever.
+"""
+import asyncio
+import contextlib
+import math
+
+from disk_budget import InsufficientDiskSpace
+
+# Seconds between free-space checks while every waiting job is too large for the disk
+DISK_RECHECK_INTERVAL = 5
+# Seconds jobs may keep waiting for disk space while no download is running (nothing will free any)
+DISK_WAIT_TIMEOUT = 120
+
+
+def _needed(job):
+    """Disk space a job still needs: its size minus what a previous run already wrote."""
+    return max(0, (job["size"] or 0) - (job.get("resumed") or 0))
+
+
+def _oldest_first(job, tracker):
+    return (job["msg_id"],)
+
+
+def _newest_first(job, tracker):
+    return (-job["msg_id"],)
+
+
+def _smallest_first(job, tracker):
+    return (job["size"] or 0, job["msg_id"])
+
+
+def _complete_seasons_first(job, tracker):
+    """
+    Seasons that already have episodes on disk go first, the ones closest to
+    complete before the others, so finished seasons reach the upload stage sooner.
+    """
+    season = tracker.get(job["series"], {}).get(job["season"], {})
+    done = len(season.get("episodes", ()))
+    total = season.get("total_expected") or job.get("total")
+    remaining = (total - done) if total else math.inf
+    return (0 if done else 1, remaining, job["series"], job["season"], job["episode"], job["msg_id"])
+
+
+# name -> key(job, tracker); lower keys are downloaded first. Add entries here to plug in new policies.
+PRIORITY_POLICIES = {
+    "oldest": _oldest_first,
+    "newest": _newest_first,
+    "smallest": _smallest_first,
+    "complete_seasons": _complete_seasons_first,
+}
+
+
+class DownloadScheduler:
+    def __init__(self, limiter, tracker, policy="complete_seasons", budget=None, accounts=None):
+        """
+        Args:
+            limiter (AdaptiveLimiter): decides how many downloads may run at once
+            tracker (dict): app.py's downloaded_episodes_tracker, read by the policies
+            policy (str): key of PRIORITY_POLICIES
+            budget (DiskBudget, optional): free-space admission control
+            accounts (dict, optional): {account: AdaptiveLimiter} capping each account's
+                share of the slots; jobs name theirs under "account"
+        """
+        if policy not in PRIORITY_POLICIES:
+            raise ValueError(f"Unknown priority policy '{policy}'. Choose from: {', '.join(PRIORITY_POLICIES)}")
+        self.limiter = limiter
+        self.tracker = tracker
+        self.policy = policy
+        self.budget = budget
+        self.accounts = accounts or {}
+        self._key = PRIORITY_POLICIES[policy]
+        self._pending = []  # [job, future] pairs waiting for a slot
+        self._changed = asyncio.Event()
+        self._task = None
+        self._disk_full_reported = False
+        self._served = {}  # {source: dispatch number of its last job}
+        self._dispatched = 0
+        self._active = 0  # jobs holding a slot
+        self._stalled_since = None  # loop time since which nothing ran and nothing fit
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    @property
+    def waiting(self):
+        return sum(1 for _, fut in self._pending if not fut.done())
+
+    async def _run(self):
+        while True:
+            while not self._pending:
+                self._changed.clear()
+                await self._changed.wait()
+            await self.limiter.acquire()
+            # Drop jobs whose workers gave up while we waited for the slot
+            self._pending = [entry for entry in self._pending if not entry[1].done()]
+            candidates = self._pending
+            if self.accounts:
+                candidates = [entry for entry in candidates if self._account_free(entry[0])]
+            if self.budget is not None and candidates:
+                available = self.budget.available()
+                candidates = [entry for entry in candidates if _needed(entry[0]) <= available]
+                if not candidates:
+                    self._report_disk_full()
+            if not candidates:
+                self.limiter.release()
+                if self._pending:
+                    if self.budget is not None:
+                        self._check_disk_stall()
+                    await self._wait_for_change(DISK_RECHECK_INTERVAL)
+                continue
+            self._disk_full_reported = False
+            self._stalled_since = None
+            best = self._pick(candidates)
+            self._pending.remove(best)
+            if self.budget is not None:
+                best[0]["reservation"] = self.budget.reserve(_needed(best[0]))
+            account = self.accounts.get(best[0].get("account"))
+            if account is not None and account.try_acquire():
+                best[0]["account_limiter"] = account
+            self._active += 1
+            best[1].set_result(True)
+
+    def _pick(self, candidates):
+        """Takes the source served longest ago, then the best job of that source under the policy."""
+        sources = {entry[0].get("source") for entry in candidates}
+        source = min(sources, key=lambda s: (self._served.get(s, -1), str(s)))
+        if len(sources) > 1:
+            candidates = [entry for entry in candidates if entry[0].get("source") == source]
+        self._served[source] = self._dispatched
+        self._dispatched += 1
+        return min(candidates, key=lambda entry: self._key(entry[0], self.tracker))
+
+    def _account_free(self, job):
+        account = self.accounts.get(job.get("account"))
+        if account is None or account.in_use < account.limit:
+            return True
+        account.note_demand()
+        return False
+
+    async def _wait_for_change(self, timeout):
+        self._changed.clear()
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def _check_disk_stall(self):
+        """Fails the waiting jobs once nothing has been downloading for DISK_WAIT_TIMEOUT and they still don't fit."""
+        if self._active:
+            self._stalled_since = None
+            return
+        now = asyncio.get_running_loop().time()
+        if self._stalled_since is None:
+            self._stalled_since = now
+            return
+        if now - self._stalled_since < DISK_WAIT_TIMEOUT:
+            return
+        gb = 1024 * 1024 * 1024
+        available = self.budget.available()
+        for job, fut in self._pending:
+            if not fut.done():
+                fut.set_exception(InsufficientDiskSpace(
+                    f"needs {_needed(job) / gb:.1f} GB, only {max(available, 0) / gb:.1f} GB can be used"
+                ))
+        self._pending = []
+        self._stalled_since = None
+        self._disk_full_reported = False
+
+    def _report_disk_full(self):
+        if self._disk_full_reported:
+            return
+        self._disk_full_reported = True
+        gb = 1024 * 1024 * 1024
+        print(f"💾 Waiting for disk space: {self.waiting} download(s) don't fit "
+              f"({self.budget.free() / gb:.1f} GB free, {self.budget.reserved / gb:.1f} GB reserved, "
+              f"{self.budget.margin / gb:.1f} GB margin)")
+
+    def _release(self, job):
+        reservation = job.pop("reservation", None)
+        if reservation is not None:
+            reservation.release()
+        account = job.pop("account_limiter", None)
+        if account is not None:
+            account.release()
+        self._active -= 1
+        self.limiter.release()
+        # A slot (and maybe disk space) just freed up; let the dispatcher re-check
+        self._changed.set()
+
+    @contextlib.asynccontextmanager
+    async def slot(self, job):
+        """
+        Waits until `job` is picked for a download slot, and holds the slot for
+        the `async with` body. Yields the job's disk Reservation (or None
+        without a budget); call its consume() as bytes are written.
+        """
+        fut = asyncio.get_running_loop().create_future()
+        entry = [job, fut]
+        self._pending.append(entry)
+        self._changed.set()
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self._release(job)
+            elif entry in self._pending:
+                self._pending.remove(entry)
+            raise
+        try:
+            yield job.get("reservation")
+        finally:
+            self._release(job)
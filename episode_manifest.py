@@ -0,0 +1,60 @@
+import json
+import os
+import time
+
+MANIFEST_PATH = "episode_manifest.jsonl"
+
+
+def append_episode(info, path=MANIFEST_PATH):
+    """
+    Appends one finished episode as a JSON line. Called by app.py as soon as a
+    download completes, so a crash never loses the episodes found before it.
+    """
+    entry = dict(info)
+    entry.setdefault("recorded_at", time.time())
+    line = json.dumps(entry, ensure_ascii=False) + "\n"
+    if _ends_mid_line(path):
+        # A crash left a partial line; start on a fresh one so this entry stays readable
+        line = "\n" + line
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(line)
+        f.flush()
+
+
+def _ends_mid_line(path):
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return False
+    with open(path, 'rb') as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) != b"\n"
+
+
+def load_manifest(path=MANIFEST_PATH):
+    """
+    Loads the manifest indexed as {series: {season_str: {episode_int: info}}}.
+    Later lines win, so a re-downloaded episode replaces its older entry.
+    Unreadable lines (e.g. a half-written last line after a crash) are skipped.
+    """
+    manifest = {}
+    if not os.path.exists(path):
+        return manifest
+
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+                series = entry["series"]
+                season = str(entry.get("season_number", "01")).zfill(2)
+                episode = int(entry["episode_number"])
+            except (ValueError, KeyError, TypeError):
+                continue
+            manifest.setdefault(series, {}).setdefault(season, {})[episode] = entry
+    return manifest
+
+
+def lookup_episode(manifest, series, season, episode):
+    """Returns the manifest entry for an episode, or None. `season` may be an int or a string."""
+    return manifest.get(series, {}).get(str(season).zfill(2), {}).get(int(episode))
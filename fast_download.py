@@ -0,0 +1,354 @@
+"""
+Parallel, resumable download of a single Telegram document.
+
+`client.download_media` fetches a file sequentially over one connection, which
+caps a multi-GB episode at the throughput of a single MTProto connection.
+This module splits the document into fixed-size parts and fetches them with
+raw `upload.GetFile` requests over a small pool of senders connected to the
+document's DC, writing every part at its offset in a preallocated file.
+
+Data is written to `<name>.part` next to a `<name>.part.json` sidecar that
+records the document id, its size and the byte ranges already on disk. An
+interrupted download resumes from those ranges on the next run, and the
+`.part` file is atomically renamed to its final name once complete.
+
+An optional StreamHasher (stream_checksum.py) is fed every chunk as it is
+written, so the finished file has a checksum without a second read pass.
+"""
+import asyncio
+import json
+import math
+import os
+import time
+
+from telethon import errors, utils
+from telethon.network import MTProtoSender
+from telethon.tl import functions
+from telethon.tl.alltlobjects import LAYER
+
+# upload.GetFile limits: `limit` must divide 1 MB and `offset` must be a multiple of `limit`
+PART_SIZE = 512 * 1024
+DEFAULT_CONNECTIONS = 4
+# Below this size the extra connections cost more than they save
+MIN_PARALLEL_SIZE = 10 * 1024 * 1024
+PART_SUFFIX = ".part"
+SIDECAR_SUFFIX = ".part.json"
+# Minimum seconds between sidecar writes while a download is running
+SIDECAR_SAVE_INTERVAL = 2.0
+
+
+class PartState:
+    """Byte ranges of a document already written to its `.part` file."""
+
+    def __init__(self, sidecar_path, document_id, size, ranges=None):
+        self.sidecar_path = sidecar_path
+        self.document_id = document_id
+        self.size = size
+        self.ranges = ranges or []  # sorted, non-overlapping [start, end) pairs
+        self._last_save = 0.0
+
+    @classmethod
+    def load(cls, part_path, document):
+        """
+        Loads the sidecar for `part_path`. Starts over (and drops the stale
+        `.part` file) if the sidecar is missing, unreadable, or describes a
+        different document.
+        """
+        sidecar_path = part_path[:-len(PART_SUFFIX)] + SIDECAR_SUFFIX
+        state = cls(sidecar_path, document.id, document.size)
+        ranges = _saved_ranges(part_path, document)
+        if ranges is not None:
+            state.ranges = ranges
+            return state
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        return state
+
+    @property
+    def covered(self):
+        return sum(end - start for start, end in self.ranges)
+
+    @property
+    def contiguous_end(self):
+        """End of the range that starts at offset 0, i.e. where a sequential resume begins."""
+        if self.ranges and self.ranges[0][0] == 0:
+            return self.ranges[0][1]
+        return 0
+
+    def has(self, start, end):
+        return any(s <= start and end <= e for s, e in self.ranges)
+
+    def add(self, start, end):
+        merged = []
+        for s, e in self.ranges:
+            if e < start or s > end:
+                merged.append([s, e])
+            else:
+                start, end = min(s, start), max(e, end)
+        merged.append([start, end])
+        merged.sort()
+        self.ranges = merged
+
+    def checkpoint(self, f):
+        """Flushes `f` and saves the sidecar, at most once per SIDECAR_SAVE_INTERVAL."""
+        if time.monotonic() - self._last_save >= SIDECAR_SAVE_INTERVAL:
+            f.flush()
+            self.save()
+
+    def save(self):
+        self._last_save = time.monotonic()
+        tmp_path = f"{self.sidecar_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"document_id": self.document_id, "size": self.size, "ranges": self.ranges}, f)
+        os.replace(tmp_path, self.sidecar_path)
+
+    def discard(self):
+        if os.path.exists(self.sidecar_path):
+            os.remove(self.sidecar_path)
+
+
+def _saved_ranges(part_path, document):
+    """Ranges recorded in the sidecar of `part_path` if it describes `document`, else None."""
+    sidecar_path = part_path[:-len(PART_SUFFIX)] + SIDECAR_SUFFIX
+    if not (os.path.exists(sidecar_path) and os.path.exists(part_path)):
+        return None
+    try:
+        with open(sidecar_path, 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+        if saved.get("document_id") == document.id and saved.get("size") == document.size:
+            return [[int(s), int(e)] for s, e in saved.get("ranges", [])]
+    except (OSError, ValueError, TypeError):
+        pass
+    return None
+
+
+def resumed_bytes(file_path, document):
+    """Bytes of `document` already in the `.part` file for `file_path` (0 if none). Changes nothing on disk."""
+    ranges = _saved_ranges(file_path + PART_SUFFIX, document)
+    return sum(end - start for start, end in ranges) if ranges else 0
+
+
+class _SenderPool:
+    """Opens `count` MTProto senders on `dc_id`, reusing the client's auth key when possible."""
+
+    def __init__(self, client, dc_id, count):
+        self.client = client
+        self.dc_id = dc_id
+        self.count = count
+        self.senders = []
+        # Same DC as the session: the existing auth key is valid on new connections.
+        # Other DC: export the authorization once, then reuse the resulting key.
+        self.auth_key = client.session.auth_key if dc_id == client.session.dc_id else None
+
+    async def _create_sender(self):
+        client = self.client
+        dc = await client._get_dc(self.dc_id)
+        sender = MTProtoSender(self.auth_key, loggers=client._log)
+        try:
+            await sender.connect(client._connection(
+                dc.ip_address,
+                dc.port,
+                dc.id,
+                loggers=client._log,
+                proxy=client._proxy,
+                local_addr=client._local_addr
+            ))
+            if not self.auth_key:
+                auth = await client(functions.auth.ExportAuthorizationRequest(self.dc_id))
+                client._init_request.query = functions.auth.ImportAuthorizationRequest(id=auth.id, bytes=auth.bytes)
+                await sender.send(functions.InvokeWithLayerRequest(LAYER, client._init_request))
+                self.auth_key = sender.auth_key
+        except BaseException:
+            await sender.disconnect()
+            raise
+        return sender
+
+    async def __aenter__(self):
+        tasks = []
+        try:
+            # The first sender may have to export the authorization; the rest reuse its key
+            self.senders.append(await self._create_sender())
+            tasks = [asyncio.ensure_future(self._create_sender()) for _ in range(self.count - 1)]
+            await asyncio.gather(*tasks)
+            self.senders.extend(task.result() for task in tasks)
+        except BaseException:
+            # Collect the senders that did connect, so close() disconnects them too
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.senders.extend(task.result() for task in tasks if not task.cancelled() and task.exception() is None)
+            await self.close()
+            raise
+        return self.senders
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self):
+        for sender in self.senders:
+            await sender.disconnect()
+        self.senders = []
+
+
+def _open_part_file(part_path, size):
+    """Opens the `.part` file for random-access writes, preallocating it on first use."""
+    if os.path.exists(part_path):
+        return open(part_path, 'r+b')
+    f = open(part_path, 'w+b')  # readable too, for StreamHasher.catch_up
+    f.truncate(size)
+    return f
+
+
+async def _download_parallel(client, document, part_path, state, progress_callback, connections, hasher=None):
+    """Fetches every part not yet recorded in `state` over `connections` parallel senders."""
+    dc_id, location = utils.get_input_location(document)
+    size = document.size
+
+    parts = asyncio.Queue()
+    for index in range(math.ceil(size / PART_SIZE)):
+        offset = index * PART_SIZE
+        if not state.has(offset, min(offset + PART_SIZE, size)):
+            parts.put_nowait(index)
+    if parts.empty():
+        return
+    connections = max(1, min(connections, parts.qsize()))
+
+    with _open_part_file(part_path, size) as f:
+        if hasher:
+            # Resumed bytes were never fed to this hasher; read back the finished prefix once
+            hasher.catch_up(f, state.contiguous_end)
+
+        async def fetch_parts(sender):
+            while True:
+                try:
+                    index = parts.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                offset = index * PART_SIZE
+                expected = min(PART_SIZE, size - offset)
+                result = await sender.send(functions.upload.GetFileRequest(location, offset=offset, limit=PART_SIZE))
+                data = result.bytes
+                if len(data) != expected:
+                    raise IOError(f"short read at offset {offset}: got {len(data)} of {expected} bytes")
+                # Single-threaded event loop: seek + write cannot interleave with another part
+                f.seek(offset)
+                f.write(data)
+                state.add(offset, offset + len(data))
+                if hasher:
+                    hasher.feed(offset, data)
+                    hasher.catch_up(f, state.contiguous_end)
+                if progress_callback:
+                    progress_callback(state.covered, size)
+                state.checkpoint(f)
+
+        try:
+            async with _SenderPool(client, dc_id, connections) as senders:
+                tasks = [asyncio.create_task(fetch_parts(sender)) for sender in senders]
+                try:
+                    await asyncio.gather(*tasks)
+                except BaseException:
+                    for task in tasks:
+                        task.cancel()
+                    await asyncio.gather(*tasks, return_exceptions=True)
+                    raise
+        finally:
+            f.flush()
+            state.save()
+
+
+async def _download_sequential(client, document, part_path, state, progress_callback, hasher=None):
+    """Fetches the document over the client's own connection, resuming after the longest complete prefix."""
+    size = document.size
+    offset = state.contiguous_end
+    if offset < size:
+        offset -= offset % PART_SIZE  # keep requests aligned so iter_download can fetch directly
+
+    with _open_part_file(part_path, size) as f:
+        try:
+            if hasher:
+                hasher.catch_up(f, offset)
+            f.seek(offset)
+            async for chunk in client.iter_download(document, offset=offset, request_size=PART_SIZE, file_size=size):
+                f.write(chunk)
+                state.add(offset, offset + len(chunk))
+                if hasher:
+                    hasher.feed(offset, chunk)
+                offset += len(chunk)
+                if progress_callback:
+                    progress_callback(state.covered, size)
+                state.checkpoint(f)
+        finally:
+            f.flush()
+            state.save()
+
+
+async def download_document(client, document, file_path, progress_callback=None, connections=DEFAULT_CONNECTIONS,
+                            hasher=None):
+    """
+    Downloads `document` to `file_path`, resuming a previous `.part` file if there is one.
+
+    Args:
+        client (TelegramClient): connected client
+        document (Document): the Telegram document to fetch
+        file_path (str): final destination path
+        progress_callback (callable, optional): called as (current, total) like download_media
+        connections (int): number of parallel connections (1 = sequential only)
+        hasher (StreamHasher, optional): fed every byte of the file; read hasher.hexdigest() afterwards
+
+    Returns:
+        str: file_path
+    """
+    size = document.size
+    part_path = file_path + PART_SUFFIX
+    state = PartState.load(part_path, document)
+    if hasher and hasher.offset > state.contiguous_end:
+        # Retrying after the .part file was dropped: what was hashed is gone
+        hasher.reset()
+    if state.covered:
+        print(f"   ↪️ Resuming '{os.path.basename(file_path)}' from {state.covered / (1024 * 1024):.1f} MB")
+        if progress_callback:
+            progress_callback(state.covered, size)
+
+    if connections > 1 and size >= MIN_PARALLEL_SIZE:
+        try:
+            await _download_parallel(client, document, part_path, state, progress_callback, connections, hasher)
+        except (asyncio.CancelledError, KeyboardInterrupt, errors.FloodWaitError):
+            # Falling back under a flood wait would only make it worse; let the caller back off
+            raise
+        except Exception as e:
+            print(f"   ⚠️ Parallel download failed ({e}), continuing on a single connection...")
+
+    if state.covered < size:
+        await _download_sequential(client, document, part_path, state, progress_callback, hasher)
+
+    if state.covered != size:
+        raise IOError(f"incomplete download: {state.covered} of {size} bytes")
+
+    if not os.path.exists(part_path):
+        # Empty document: nothing was written, but the file must still exist
+        open(part_path, 'wb').close()
+    if os.path.getsize(part_path) != size:
+        raise IOError(f"size mismatch: file has {os.path.getsize(part_path)} bytes, document has {size}")
+    if hasher:
+        if hasher.offset < size:
+            # Only parts that arrived too far out of order are read back here
+            with open(part_path, 'rb') as f:
+                hasher.catch_up(f, size)
+        if hasher.offset != size:
+            raise IOError(f"checksum covers {hasher.offset} of {size} bytes")
+    os.replace(part_path, file_path)
+    state.discard()
+    return file_path
+
+
+async def download_media(client, msg, file_path, progress_callback=None, connections=DEFAULT_CONNECTIONS,
+                         hasher=None):
+    """
+    Drop-in replacement for `client.download_media(msg, file=...)`.
+    Documents go through the resumable (and, when large enough, parallel) path;
+    anything else is handed to the regular download (and not hashed).
+    """
+    document = getattr(msg.media, 'document', None) if msg.media else None
+    if document is None:
+        return await client.download_media(msg, file=file_path, progress_callback=progress_callback)
+    return await download_document(client, document, file_path, progress_callback, connections, hasher)
@@ -1,20 +1,313 @@
+import asyncio
+import atexit
+import copy
+import functools
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from typing import Optional
-import ftplib
 import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from ftp_pool import CONNECTION_ERRORS, FTPPool
+from rate_limiter import RateLimiter
+
+# (connect, read) timeouts in seconds for API calls
+REQUEST_TIMEOUT = (5, 30)
+# Retries for connection errors and 5xx responses, with jittered exponential backoff.
+# Rate-limit answers (429) are retried through the shared RateLimiter instead, so every caller slows down.
+MAX_RETRIES = 4
+RETRY_BACKOFF = 0.5
+RETRY_STATUSES = (500, 502, 503, 504)
+# Keep-alive connections per host; enough for parallel uploaders sharing the session
+POOL_SIZE = 16
+
+
+class _JitteredRetry(Retry):
+    """
+    Retry whose backoff is randomized, so parallel callers don't retry in lockstep.
+    429s are left to FileMoon._req, which slows down every caller through the rate limiter.
+    """
+
+    def is_retry(self, method: str, status_code: int, has_retry_after: bool = False) -> bool:
+        if status_code == 429:
+            return False
+        return super().is_retry(method, status_code, has_retry_after)
+
+    def get_backoff_time(self) -> float:
+        backoff = super().get_backoff_time()
+        return backoff * random.uniform(0.5, 1.5) if backoff else 0
+
+
+def create_session() -> requests.Session:
+    """A requests.Session with pooled keep-alive connections, retries and backoff."""
+    retry = _JitteredRetry(
+        total=MAX_RETRIES,
+        backoff_factor=RETRY_BACKOFF,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(["GET"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,  # the last response's error JSON is still returned to the caller
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+_shared_session = None
+_shared_session_lock = threading.Lock()
+
+
+# Requests per second and burst size per endpoint group, shared by every client in the process.
+# FileMoon doesn't publish its limits; these stay under what we have seen it accept.
+RATE_LIMITS = {
+    "default": (5.0, 10),
+    "list": (2.0, 5),
+    "account": (1.0, 2),
+    "remote": (1.0, 3),
+    "encoding": (2.0, 5),
+}
+# Endpoint (or its first path segment) -> RATE_LIMITS group
+RATE_LIMIT_GROUPS = {
+    "file/list": "list",
+    "account": "account",
+    "remote": "remote",
+    "encoding": "encoding",
+}
+# Pause after a rate-limit answer that doesn't say how long to wait
+DEFAULT_RATE_LIMIT_PAUSE = 10
+
+_shared_rate_limiter = None
+
+
+def shared_rate_limiter() -> RateLimiter:
+    """The process-wide limiter for FileMoon API calls, used by sync and async clients alike."""
+    global _shared_rate_limiter
+    with _shared_session_lock:
+        if _shared_rate_limiter is None:
+            _shared_rate_limiter = RateLimiter(RATE_LIMITS)
+        return _shared_rate_limiter
+
+
+def _rate_group(endpoint: str) -> str:
+    return RATE_LIMIT_GROUPS.get(endpoint) or RATE_LIMIT_GROUPS.get(endpoint.split("/", 1)[0], "default")
+
+
+def _rate_limit_pause(status_code: int, headers, response=None) -> Optional[float]:
+    """
+    Seconds to back off if the answer means "too many requests", else None.
+    Looks at the HTTP status and Retry-After, then at FileMoon's error JSON.
+    """
+    limited = status_code == 429
+    if not limited and isinstance(response, dict):
+        msg = str(response.get("msg", "")).lower()
+        limited = str(response.get("status")) == "429" or "too many" in msg or "rate limit" in msg
+    if not limited:
+        return None
+    hints = [headers.get("Retry-After") if headers else None]
+    if isinstance(response, dict):
+        hints += [response.get("retry_after"), response.get("wait")]
+    for hint in hints:
+        try:
+            if hint is not None:
+                return max(float(hint), 0.0)
+        except (TypeError, ValueError):
+            pass
+    return DEFAULT_RATE_LIMIT_PAUSE
+
+
+_shared_ftp_pool = None
+
+
+def shared_ftp_pool() -> FTPPool:
+    """The process-wide pool of FTP upload connections."""
+    global _shared_ftp_pool
+    with _shared_session_lock:
+        if _shared_ftp_pool is None:
+            _shared_ftp_pool = FTPPool()
+            atexit.register(_shared_ftp_pool.close)
+        return _shared_ftp_pool
+
+
+def shared_session() -> requests.Session:
+    """The process-wide session used by every FileMoon client that doesn't bring its own."""
+    global _shared_session
+    with _shared_session_lock:
+        if _shared_session is None:
+            _shared_session = create_session()
+        return _shared_session
+
+
+# Seconds a read-only response stays cached, per endpoint. Endpoints not listed are never cached.
+CACHE_TTLS = {
+    "account/info": 300,
+    "account/stats": 300,
+    "file/info": 60,
+    "file/list": 15,  # only lookups by name, see CACHE_REQUIRES_PARAM
+    "folder/list": 120,
+    "encoding/status": 10,
+}
+# Endpoints only cached when this parameter is in the query (file/list pages must stay fresh)
+CACHE_REQUIRES_PARAM = {"file/list": "name"}
+# "Not found" answers are kept for at most this long, so new uploads show up quickly
+NEGATIVE_CACHE_TTL = 5
+CACHE_MAX_ENTRIES = 512
+# What each mutating call makes stale
+CACHE_INVALIDATED_BY = {
+    "ftp_upload": ("file/list", "folder/list", "account/info", "account/stats"),
+    "remote/add": ("file/list", "folder/list", "account/info", "account/stats"),
+    "file/clone": ("file/list", "folder/list", "account/info", "account/stats"),
+    "folder/create": ("folder/list",),
+}
+
+
+class ResponseCache:
+    """
+    Opt-in TTL + LRU cache for read-only FileMoon API responses, keyed by the
+    request URL (endpoint and params). Thread-safe, so one cache can be shared
+    by several clients and threads. Pass it as FileMoon(api_key, cache=ResponseCache()).
+    Responses are copied on the way in and out, so callers may mutate what they get.
+    """
+
+    def __init__(self, ttls=None, max_entries=CACHE_MAX_ENTRIES, negative_ttl=NEGATIVE_CACHE_TTL):
+        self.ttls = dict(CACHE_TTLS if ttls is None else ttls)
+        self.max_entries = max_entries
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()  # {url: (endpoint, expires_at, response)}, least recently used first
+        self._lock = threading.Lock()
+        self.hits = {}
+        self.misses = {}
+
+    def cacheable(self, endpoint: str, url: str) -> bool:
+        if endpoint not in self.ttls:
+            return False
+        param = CACHE_REQUIRES_PARAM.get(endpoint)
+        return param is None or f"&{param}=" in url
+
+    def get(self, endpoint: str, url: str):
+        """Returns the cached response, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(url)
+                self.hits[endpoint] = self.hits.get(endpoint, 0) + 1
+                return copy.deepcopy(entry[2])
+            if entry is not None:
+                del self._entries[url]
+            self.misses[endpoint] = self.misses.get(endpoint, 0) + 1
+            return None
+
+    def put(self, endpoint: str, url: str, response: dict):
+        if _is_not_found(response):
+            ttl = min(self.negative_ttl, self.ttls[endpoint])
+        elif _is_ok(response):
+            ttl = self.ttls[endpoint]
+        else:
+            return  # errors (rate limits, auth...) are never cached
+        with self._lock:
+            self._entries[url] = (endpoint, time.monotonic() + ttl, copy.deepcopy(response))
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *endpoints: str):
+        """Drops cached responses of `endpoints` (all of them if none given)."""
+        with self._lock:
+            if not endpoints:
+                self._entries.clear()
+                return
+            for url in [url for url, entry in self._entries.items() if entry[0] in endpoints]:
+                del self._entries[url]
+
+    def stats(self) -> dict:
+        with self._lock:
+            endpoints = sorted(set(self.hits) | set(self.misses))
+            return {
+                "entries": len(self._entries),
+                "hits": sum(self.hits.values()),
+                "misses": sum(self.misses.values()),
+                "by_endpoint": {e: {"hits": self.hits.get(e, 0), "misses": self.misses.get(e, 0)} for e in endpoints},
+            }
+
+    def report(self):
+        stats = self.stats()
+        total = stats["hits"] + stats["misses"]
+        if not total:
+            return
+        print(f"🗃️ FileMoon cache: {stats['hits']}/{total} hits ({stats['entries']} entries)")
+        for endpoint, counts in stats["by_endpoint"].items():
+            print(f"   {endpoint}: {counts['hits']} hits, {counts['misses']} misses")
+
+
+def _is_ok(response) -> bool:
+    return isinstance(response, dict) and str(response.get("status", "200")) == "200"
+
+
+def _is_not_found(response) -> bool:
+    """Answers meaning "no such file/folder": a 404 status, or a lookup that matched nothing."""
+    if not isinstance(response, dict):
+        return False
+    if str(response.get("status")) == "404":
+        return True
+    result = response.get("result")
+    if not _is_ok(response):
+        return False
+    if result in (None, [], {}) or (isinstance(result, dict) and result.get("files") == []):
+        return True
+    # file/info answers missing codes with per-file 404 entries
+    return isinstance(result, list) and all(isinstance(item, dict) and str(item.get("status")) == "404" for item in result)
+
 
 class FileMoon:
-    def __init__(self, api_key: str, base_url="https://filemoonapi.com/api/", player_url="https://filemoonapi.com/e/"):
+    def __init__(self, api_key: str, base_url="https://filemoonapi.com/api/", player_url="https://filemoonapi.com/e/",
+                 session: Optional[requests.Session] = None, timeout=REQUEST_TIMEOUT,
+                 cache: Optional[ResponseCache] = None, rate_limiter: Optional[RateLimiter] = None,
+                 ftp_pool: Optional[FTPPool] = None):
         """
         init
 
         Args:
             api_key (str): api key from filemoon
             base_url (str, optional): base api url. Defaults to "https://filemoonapi.com/api/".
+            session (Optional[requests.Session]): HTTP session to use. Defaults to the shared pooled session.
+            timeout (tuple, optional): (connect, read) timeouts in seconds. Defaults to REQUEST_TIMEOUT.
+            cache (Optional[ResponseCache]): cache for read-only calls. Defaults to None (no caching).
+            rate_limiter (Optional[RateLimiter]): Defaults to the process-wide shared_rate_limiter().
+            ftp_pool (Optional[FTPPool]): connections for ftp_upload. Defaults to the process-wide shared_ftp_pool().
         """
         self.api_key = api_key
         self.base_url = base_url
         self.player_url = player_url
+        self.session = session or shared_session()
+        self.timeout = timeout
+        self.cache = cache
+        self.rate_limiter = rate_limiter or shared_rate_limiter()
+        self.ftp_pool = ftp_pool or shared_ftp_pool()
+
+    def _endpoint(self, url: str) -> str:
+        """e.g. "file/info" for f_info's url"""
+        if url.startswith(self.base_url):
+            return url[len(self.base_url):].split("?", 1)[0]
+        return ""
+
+    def _cached(self, url: str):
+        """(endpoint, cached response or None) for `url`."""
+        endpoint = self._endpoint(url)
+        if self.cache is not None and self.cache.cacheable(endpoint, url):
+            return endpoint, self.cache.get(endpoint, url)
+        return endpoint, None
+
+    def _remember(self, endpoint: str, url: str, response: dict):
+        if self.cache is None:
+            return
+        if self.cache.cacheable(endpoint, url):
+            self.cache.put(endpoint, url, response)
+        elif endpoint in CACHE_INVALIDATED_BY:
+            self.cache.invalidate(*CACHE_INVALIDATED_BY[endpoint])
 
     def _req(self, url: str) -> dict:
         """requests to api
@@ -24,15 +317,28 @@ class FileMoon:
 
         Return:
             (dict): output dict from requests url"""
-        try:
-            r = requests.get(url)
-            response = r.json()
-            if response["msg"] == "Wrong Auth":
-                raise Exception("Invalid API key, please check your API key")
-            else:
-                return response
-        except ConnectionError as e:
-            raise Exception(e)
+        endpoint, cached = self._cached(url)
+        if cached is not None:
+            return cached
+        group = _rate_group(endpoint)
+        for attempt in range(MAX_RETRIES + 1):
+            self.rate_limiter.acquire(group)
+            try:
+                r = self.session.get(url, timeout=self.timeout)
+                response = r.json() if r.status_code != 429 else None
+            except requests.exceptions.RequestException as e:
+                # Includes invalid JSON bodies (requests.exceptions.JSONDecodeError)
+                raise Exception(e)
+            pause = _rate_limit_pause(r.status_code, r.headers, response)
+            if pause is None:
+                break
+            if attempt >= MAX_RETRIES:
+                raise Exception(f"FileMoon rate limit still hit after {MAX_RETRIES} retries")
+            self.rate_limiter.penalize(group, pause)
+        if response.get("msg") == "Wrong Auth":
+            raise Exception("Invalid API key, please check your API key")
+        self._remember(endpoint, url, response)
+        return response
 
     def info(self) -> dict:
         """
@@ -384,62 +690,221 @@ class FileMoon:
         Returns:
             bool: True if successful, False otherwise.
         """
-        try:
-            ftp = ftplib.FTP(ftp_host)
-            ftp.login(ftp_user, ftp_pass)
-            
-            # Extract directory and filename from remote path
-            remote_dir = os.path.dirname(remote_file_path)
-            remote_filename = os.path.basename(remote_file_path)
-            
-            # Ensure remote directory exists
-            if remote_dir and remote_dir != "/" and remote_dir != ".":
-                parts = remote_dir.strip("/").split("/")
-                current_path = ""
-                for part in parts:
-                    current_path = f"/{part}" if not current_path else f"{current_path}/{part}"
-                    try:
-                        ftp.cwd(current_path)
-                    except ftplib.error_perm as e_cwd:
-                        # print(f"DEBUG: cwd failed for {current_path}: {e_cwd}")
-                        try:
-                            ftp.mkd(current_path)
-                            ftp.cwd(current_path)
-                        except ftplib.error_perm as e_mkd:
-                            # If mkd failed because it exists, try cwd again (maybe it was a transient issue or permissions?)
-                            if "550" in str(e_mkd) and "exist" in str(e_mkd):
-                                try:
-                                    ftp.cwd(current_path)
-                                except ftplib.error_perm as e_cwd_retry:
-                                    print(f"Error accessing existing directory {current_path}: {e_cwd_retry}")
-                                    return False
-                            else:
-                                print(f"Error creating directory {current_path}: {e_mkd}")
-                                return False
-            
-            # If we are at root or just changed to the target dir, we can upload
-            # Note: ftp.cwd() changes the current directory for the session
-            
-            file_size = os.path.getsize(local_file_path)
-            
-            class ProgressTracker:
-                def __init__(self):
-                    self.bytes_sent = 0
-                
-                def handle(self, block):
-                    self.bytes_sent += len(block)
-                    if progress_callback:
-                        progress_callback(self.bytes_sent, file_size, remote_filename)
-
+        remote_dir = os.path.dirname(remote_file_path)
+        remote_filename = os.path.basename(remote_file_path)
+        file_size = os.path.getsize(local_file_path)
+
+        class ProgressTracker:
+            def __init__(self):
+                self.bytes_sent = 0
+
+            def handle(self, block):
+                self.bytes_sent += len(block)
+                if progress_callback:
+                    progress_callback(self.bytes_sent, file_size, remote_filename)
+
+        # A pooled connection may have been dropped by the server; that is retried once on a fresh login
+        for attempt in range(2):
+            try:
+                ftp = self.ftp_pool.acquire(ftp_host, ftp_user, ftp_pass)
+            except Exception as e:
+                print(f"FTP Upload Error: {e}")
+                return False
+            reused = ftp.reused
             tracker = ProgressTracker()
-            
-            with open(local_file_path, 'rb') as f:
-                # Increased buffer size to 1MB for faster uploads
-                ftp.storbinary(f'STOR {remote_filename}', f, 1048576, tracker.handle)
-            
-            ftp.quit()
+            try:
+                # Ensure remote directory exists (known folders are not walked again)
+                self.ftp_pool.change_dir(ftp, ftp_host, ftp_user, remote_dir)
+                with open(local_file_path, 'rb') as f:
+                    # Increased buffer size to 1MB for faster uploads
+                    ftp.storbinary(f'STOR {remote_filename}', f, 1048576, tracker.handle)
+            except CONNECTION_ERRORS as e:
+                self.ftp_pool.release(ftp_host, ftp_user, ftp, broken=True)
+                if reused and attempt == 0 and tracker.bytes_sent == 0:
+                    continue
+                print(f"FTP Upload Error: {e}")
+                return False
+            except Exception as e:
+                self.ftp_pool.release(ftp_host, ftp_user, ftp, broken=True)
+                print(f"FTP Upload Error: {e}")
+                return False
+
+            self.ftp_pool.release(ftp_host, ftp_user, ftp)
+            if self.cache is not None:
+                self.cache.invalidate(*CACHE_INVALIDATED_BY["ftp_upload"])
             return True
-            
-        except Exception as e:
-            print(f"FTP Upload Error: {e}")
-            return False
\ No newline at end of file
+        return False
+
+
+# Pages fetched at once by AsyncFileMoon.iter_all_files
+PAGE_CONCURRENCY = 8
+# Attempts per page before iter_all_files gives up (a missing page would make the listing incomplete)
+PAGE_RETRIES = 3
+
+
+class AsyncFileMoon(FileMoon):
+    """
+    asyncio version of FileMoon on a pooled aiohttp session (aiohttp is only
+    imported when the first request is made). Every API method has the same
+    name and arguments as on FileMoon and returns a coroutine:
+
+        async with AsyncFileMoon(api_key) as client:
+            info = await client.f_info(file_code)
+            async for file_data in client.iter_all_files():
+                ...
+    """
+
+    def __init__(self, api_key: str, base_url="https://filemoonapi.com/api/", player_url="https://filemoonapi.com/e/",
+                 timeout=REQUEST_TIMEOUT, max_connections=POOL_SIZE, cache: Optional[ResponseCache] = None,
+                 rate_limiter: Optional[RateLimiter] = None):
+        """
+        Args:
+            api_key (str): api key from filemoon
+            timeout (tuple, optional): (connect, read) timeouts in seconds. Defaults to REQUEST_TIMEOUT.
+            max_connections (int, optional): size of the connection pool. Defaults to POOL_SIZE.
+            cache (Optional[ResponseCache]): cache for read-only calls, may be shared with sync clients.
+            rate_limiter (Optional[RateLimiter]): Defaults to the process-wide shared_rate_limiter().
+        """
+        super().__init__(api_key, base_url, player_url, timeout=timeout, cache=cache, rate_limiter=rate_limiter)
+        self.max_connections = max_connections
+        self._http = None
+
+    def _get_http(self):
+        if self._http is None or self._http.closed:
+            import aiohttp
+            connect, read = self.timeout
+            self._http = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                timeout=aiohttp.ClientTimeout(sock_connect=connect, sock_read=read),
+            )
+        return self._http
+
+    async def close(self):
+        if self._http is not None:
+            await self._http.close()
+            self._http = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _req(self, url: str) -> dict:
+        """Async requests to api: connection errors and 5xx are retried like the sync session,
+        rate-limit answers slow down every caller through the shared limiter.
+
+        Args:
+            url (str): api url
+
+        Return:
+            (dict): output dict from requests url"""
+        import aiohttp
+        endpoint, cached = self._cached(url)
+        if cached is not None:
+            return cached
+        http = self._get_http()
+        group = _rate_group(endpoint)
+        for attempt in range(MAX_RETRIES + 1):
+            await self.rate_limiter.acquire_async(group)
+            retry_after = None
+            response = None
+            try:
+                async with http.get(url) as r:
+                    if r.status != 429 and (r.status not in RETRY_STATUSES or attempt >= MAX_RETRIES):
+                        response = await r.json(content_type=None)
+                    pause = _rate_limit_pause(r.status, r.headers, response)
+                    if pause is None and response is None:
+                        retry_after = r.headers.get("Retry-After")
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                if attempt >= MAX_RETRIES:
+                    raise Exception(e)
+                pause = None
+            if pause is not None:
+                if attempt >= MAX_RETRIES:
+                    raise Exception(f"FileMoon rate limit still hit after {MAX_RETRIES} retries")
+                self.rate_limiter.penalize(group, pause)
+                continue
+            if response is not None:
+                break
+            # 5xx or connection error: back off like the sync session's Retry
+            delay = RETRY_BACKOFF * (2 ** attempt) * random.uniform(0.5, 1.5)
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, int(retry_after))
+            await asyncio.sleep(delay)
+        if response.get("msg") == "Wrong Auth":
+            raise Exception("Invalid API key, please check your API key")
+        self._remember(endpoint, url, response)
+        return response
+
+    async def ftp_upload(self, *args, **kwargs) -> bool:
+        """FileMoon.ftp_upload in a worker thread; same arguments."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(super().ftp_upload, *args, **kwargs))
+
+    async def iter_all_files(self, per_page: int = 100, concurrency: int = PAGE_CONCURRENCY, **filters):
+        """
+        Yields every file of the account (or of `filters`, e.g. fld_id=...).
+        The first page tells how many pages there are; the rest are fetched
+        `concurrency` at a time and their files yielded as each page arrives,
+        so rows are not in page order. A page that still fails after
+        PAGE_RETRIES attempts raises, so a listing is never silently short.
+        """
+        async def fetch_result(page):
+            for attempt in range(1, PAGE_RETRIES + 1):
+                try:
+                    response = await self.f_list(per_page=str(per_page), page=str(page), **filters)
+                    if not _is_ok(response):
+                        raise Exception(f"FileMoon answered {response!r}")
+                    return response.get("result") or {}
+                except Exception as e:
+                    if attempt >= PAGE_RETRIES:
+                        raise Exception(f"FileMoon page {page} failed after {attempt} attempts: {e}") from e
+                    print(f"⚠️ FileMoon page {page} failed ({e}), retrying...")
+                    await asyncio.sleep(RETRY_BACKOFF * 2 ** (attempt - 1))
+
+        result = await fetch_result(1)
+        files = result.get("files") or []
+        for file_data in files:
+            yield file_data
+        if len(files) < per_page:
+            return
+
+        pages = _page_count(result, per_page)
+        if pages is None:
+            # The API didn't say how many pages there are; walk them one by one
+            page = 2
+            while True:
+                files = (await fetch_result(page)).get("files") or []
+                for file_data in files:
+                    yield file_data
+                if len(files) < per_page:
+                    return
+                page += 1
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(page):
+            async with semaphore:
+                return (await fetch_result(page)).get("files") or []
+
+        tasks = [asyncio.ensure_future(fetch(page)) for page in range(2, pages + 1)]
+        try:
+            for next_page in asyncio.as_completed(tasks):
+                for file_data in await next_page:
+                    yield file_data
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+def _page_count(result: dict, per_page: int) -> Optional[int]:
+    """Number of pages from an f_list result ("pages", or "results_total"), if it says."""
+    try:
+        if result.get("pages") is not None:
+            return int(result["pages"])
+        if result.get("results_total") is not None:
+            return -(-int(result["results_total"]) // per_page)
+    except (TypeError, ValueError):
+        pass
+    return None
@@ -0,0 +1,181 @@
+"""
+Background resolution of FileMoon file codes after FTP uploads.
+
+FileMoon takes a while to index a file uploaded over FTP, and the API only
+knows it by its file code once it has. Instead of sleeping after every
+upload and polling for that one file, uploaders register the names they are
+waiting for and move on. A single poller thread reads the newest pages of
+`f_list` and resolves every pending name found there in one pass, backing
+off while nothing new shows up. Names still missing after a while are
+also looked up one by one with `f_list(name=...)`, like before.
+"""
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future
+
+# Seconds between polls: starts at MIN, grows by BACKOFF while nothing resolves, capped at MAX
+MIN_POLL_INTERVAL = 5
+MAX_POLL_INTERVAL = 30
+POLL_BACKOFF = 1.5
+# Newest f_list pages read per poll
+POLL_PAGES = 2
+PER_PAGE = 100
+# Pending this long -> also looked up by name; this long -> given up (future resolves to None)
+LOOKUP_AFTER = 30
+RESOLVE_TIMEOUT = 300
+
+
+def normalize_name(name):
+    """FileMoon titles drop the extension and may turn separators into spaces; compare on that."""
+    base, ext = os.path.splitext(name or "")
+    if ext and len(ext) <= 5 and not ext[1:].isdigit():
+        name = base
+    return re.sub(r'[\s._-]+', ' ', name or "").strip().lower()
+
+
+class FileCodeResolver:
+    def __init__(self, filemoon_client, timeout=RESOLVE_TIMEOUT, pages=POLL_PAGES):
+        """
+        Args:
+            filemoon_client (FileMoon): API client used for the polls
+            timeout (float): seconds after which a name is given up on
+            pages (int): newest f_list pages read per poll
+        """
+        self.client = filemoon_client
+        self.timeout = timeout
+        self.pages = pages
+        self._pending = {}  # {normalized name: {"name", "futures", "registered", "looked_up"}}
+        self._cond = threading.Condition()
+        self._stop = False
+        self._thread = None
+        self.resolved = 0
+        self.expired = 0
+        self.polls = 0
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return self
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name="filemoon-code-resolver", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops polling; names still pending resolve to None."""
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        with self._cond:
+            pending, self._pending = self._pending, {}
+        for entry in pending.values():
+            for future in entry["futures"]:
+                if not future.done():
+                    future.set_result(None)
+
+    def register(self, name):
+        """
+        Starts waiting for the file code of uploaded file `name`.
+        Returns a concurrent.futures.Future with the code (None if it never showed up).
+        """
+        future = Future()
+        key = normalize_name(name)
+        with self._cond:
+            entry = self._pending.setdefault(
+                key, {"name": name, "futures": [], "registered": time.monotonic(), "looked_up": 0.0}
+            )
+            entry["futures"].append(future)
+            self._cond.notify_all()
+        return future
+
+    @property
+    def waiting(self):
+        with self._cond:
+            return len(self._pending)
+
+    def _resolve(self, key, file_code):
+        with self._cond:
+            entry = self._pending.pop(key, None)
+        if not entry:
+            return False
+        print(f"✅ File code for '{entry['name']}': {file_code}")
+        self.resolved += 1
+        for future in entry["futures"]:
+            if not future.done():
+                future.set_result(file_code)
+        return True
+
+    def _expire(self):
+        now = time.monotonic()
+        with self._cond:
+            expired = [key for key, entry in self._pending.items() if now - entry["registered"] > self.timeout]
+            entries = [self._pending.pop(key) for key in expired]
+        for entry in entries:
+            print(f"❌ Gave up waiting for the file code of '{entry['name']}'")
+            self.expired += 1
+            for future in entry["futures"]:
+                if not future.done():
+                    future.set_result(None)
+
+    def poll(self):
+        """One pass: newest pages first, then name lookups for old entries. Returns how many resolved."""
+        self.polls += 1
+        found = 0
+        for page in range(1, self.pages + 1):
+            with self._cond:
+                if not self._pending:
+                    break
+            try:
+                response = self.client.f_list(per_page=str(PER_PAGE), page=str(page))
+            except Exception as e:
+                print(f"⚠️ File code poll failed: {e}")
+                break
+            files = ((response or {}).get("result") or {}).get("files") or []
+            for file_data in files:
+                code = file_data.get("file_code")
+                for field in ("title", "name", "file_name"):
+                    key = normalize_name(file_data.get(field))
+                    if code and key and self._resolve(key, code):
+                        found += 1
+                        break
+            if len(files) < PER_PAGE:
+                break
+
+        now = time.monotonic()
+        with self._cond:
+            # At most one name lookup per entry every LOOKUP_AFTER seconds
+            stale = [(key, entry["name"]) for key, entry in self._pending.items()
+                     if now - max(entry["registered"], entry["looked_up"]) > LOOKUP_AFTER]
+            for key, _ in stale:
+                self._pending[key]["looked_up"] = now
+        for key, name in stale:
+            try:
+                response = self.client.f_list(name=name)
+            except Exception as e:
+                print(f"⚠️ File code lookup for '{name}' failed: {e}")
+                continue
+            files = ((response or {}).get("result") or {}).get("files") or []
+            if files and files[0].get("file_code") and self._resolve(key, files[0]["file_code"]):
+                found += 1
+
+        self._expire()
+        return found
+
+    def _run(self):
+        interval = MIN_POLL_INTERVAL
+        while True:
+            with self._cond:
+                while not self._pending and not self._stop:
+                    self._cond.wait()
+                    interval = MIN_POLL_INTERVAL
+                if self._stop:
+                    return
+                # Give FileMoon a moment to index; a new registration doesn't cut the wait short
+                self._cond.wait_for(lambda: self._stop, timeout=interval)
+                if self._stop:
+                    return
+            interval = MIN_POLL_INTERVAL if self.poll() else min(interval * POLL_BACKOFF, MAX_POLL_INTERVAL)
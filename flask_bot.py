@@ -3,10 +3,12 @@ import re
 import json
 import asyncio
 import concurrent.futures
-import csv
 from flask import Flask, jsonify
 from dotenv import load_dotenv
-from fileMoon import FileMoon  # Import the FileMoon class
+from fileMoon import FileMoon, AsyncFileMoon  # Import the FileMoon class
+from update_csv import export_files_csv
+from download_registry import REGISTRY_PATH, DownloadRegistry
+from transfer_progress import TransferProgress
 
 # Load environment variables
 load_dotenv()
@@ -22,6 +24,9 @@ FTP_PASS = os.getenv("FTP_PASS")
 MAX_CONCURRENT_UPLOADS = 3
 # ===========================================
 
+# Shared progress slots for concurrent uploads, printed by a single reporter thread
+upload_progress = TransferProgress(label="FileMoon uploads")
+
 # Initialize FileMoon client
 filemoon_client = None
 if FILEMOON_API_KEY:
@@ -40,16 +45,11 @@ def extract_info_from_filename(filename):
         info["episode_number"] = int(match.group(3))
     return info
 
-def upload_progress_callback(current, total, file_name):
-    """Callback function to display upload progress."""
-    # Simplified progress to avoid garbled output with concurrency
-    percentage = (current / total) * 100
-    if int(percentage) % 20 == 0 and int(percentage) > 0: # Print every 20%
-         print(f"         Uploading '{file_name}': {percentage:.0f}%", end='\r')
-
 def upload_single_file_sync(local_file_path, remote_ftp_path, filename):
     """Synchronous wrapper for the upload to be run in a thread."""
+    slot = None
     try:
+        slot = upload_progress.open(filename, os.path.getsize(local_file_path))
         print(f"      ⬆️ Starting upload: '{filename}'")
         success = filemoon_client.ftp_upload(
             local_file_path,
@@ -57,11 +57,14 @@ def upload_single_file_sync(local_file_path, remote_ftp_path, filename):
             FTP_USER,
             FTP_PASS,
             remote_ftp_path,
-            progress_callback=upload_progress_callback
+            progress_callback=lambda current, total, _name: slot.update(current, total)
         )
         return success, None
     except Exception as e:
         return False, str(e)
+    finally:
+        if slot is not None:
+            upload_progress.close(slot)
 
 async def upload_local_files_to_filemoon():
     if not filemoon_client:
@@ -127,6 +130,7 @@ async def upload_local_files_to_filemoon():
             
             if success:
                 print(f"\n         ✅ Finished: '{file_info['filename']}'")
+                registry.mark_uploaded(file_info['local_path'])
                 try:
                     os.remove(file_info['local_path'])
                     print(f"         🗑️ Deleted local file: '{file_info['local_path']}'")
@@ -141,7 +145,14 @@ async def upload_local_files_to_filemoon():
     tasks = [upload_task(f) for f in files_to_upload]
     
     if tasks:
-        results = await asyncio.gather(*tasks)
+        # Uploaded episodes stay marked as downloaded once their local file is deleted
+        registry = DownloadRegistry(REGISTRY_PATH).load()
+        upload_progress.start_reporter()
+        try:
+            results = await asyncio.gather(*tasks)
+        finally:
+            upload_progress.stop_reporter()
+            registry.close()
         
         for success, error_msg in results:
             if success:
@@ -150,6 +161,7 @@ async def upload_local_files_to_filemoon():
                 failed_uploads.append(error_msg)
 
     print(f"\n🎉 Completed FileMoon upload process. Total uploaded: {uploaded_count}, Failed: {len(failed_uploads)}")
+    filemoon_client.ftp_pool.report()
     
     # Generate CSV after uploads
     csv_file = await generate_filemoon_csv()
@@ -170,49 +182,15 @@ async def generate_filemoon_csv():
     csv_filename = "filemoon_files.csv"
     
     try:
-        # Run in executor to avoid blocking
-        loop = asyncio.get_running_loop()
-        await loop.run_in_executor(None, _write_csv_sync, csv_filename)
-        print(f"✅ CSV report saved to: {csv_filename}")
+        # Pages are fetched concurrently on the async client
+        async with AsyncFileMoon(FILEMOON_API_KEY) as client:
+            total_files = await export_files_csv(client, csv_filename)
+        print(f"✅ CSV report with {total_files} files saved to: {csv_filename}")
         return csv_filename
     except Exception as e:
         print(f"❌ Failed to generate CSV: {e}")
         return None
 
-def _write_csv_sync(filename):
-    """Synchronous helper to fetch files and write CSV."""
-    with open(filename, mode='w', newline='', encoding='utf-8') as csv_file:
-        fieldnames = ['file_code', 'title', 'file_size', 'uploaded', 'status', 'public']
-        writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
-        writer.writeheader()
-        
-        page = 1
-        while True:
-            # Fetch files page by page
-            response = filemoon_client.f_list(per_page="100", page=str(page))
-            if not response or 'result' not in response or 'files' not in response['result']:
-                break
-            
-            files = response['result']['files']
-            if not files:
-                break
-                
-            for file_data in files:
-                writer.writerow({
-                    'file_code': file_data.get('file_code', ''),
-                    'title': file_data.get('title', ''),
-                    'file_size': file_data.get('file_size', ''),
-                    'uploaded': file_data.get('uploaded', ''),
-                    'status': file_data.get('status', ''),
-                    'public': file_data.get('public', '')
-                })
-            
-            # Check if we have more pages (simple check: if we got fewer than requested, we're likely done)
-            # But safer to just increment and check if next page returns empty
-            if len(files) < 100:
-                break
-            page += 1
-
 @app.route("/")
 def index():
     return "Telegram FileMoon Bot Flask Server is running. Use /upload_to_filemoon to initiate local file uploads."
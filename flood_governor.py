@@ -0,0 +1,113 @@
+"""
+Shared FloodWait handling for one Telegram account.
+
+Telegram answers with FLOOD_WAIT_X when an account sends too many requests
+of a kind. Without coordination every task that hits it fails on its own,
+and the tasks that did not hit it yet keep sending and make it worse.
+
+All Telethon calls of a client go through its FloodGovernor, grouped by
+method class (e.g. "resolve", "history", "download", "delete"). When a call
+gets a FloodWaitError, every caller of that class waits until the flood
+wait is over, then the call is retried with a growing extra backoff.
+The seconds spent paused are counted per class.
+"""
+import asyncio
+import random
+import time
+
+from telethon import errors
+
+MAX_RETRIES = 5
+# Extra seconds added to the n-th consecutive wait: BACKOFF_BASE * 2**n (plus jitter)
+BACKOFF_BASE = 1.0
+# Flood waits longer than this are not worth sitting out; the call fails instead
+MAX_FLOOD_WAIT = 30 * 60
+
+
+class FloodGovernor:
+    def __init__(self, label="telegram", max_retries=MAX_RETRIES, max_wait=MAX_FLOOD_WAIT, on_flood_wait=None):
+        """
+        Args:
+            label (str): shown in log lines, usually the session name
+            max_retries (int): flood waits sat out per call before giving up
+            max_wait (float): longest flood wait (seconds) that is waited out
+            on_flood_wait (callable, optional): called with the seconds of every
+                flood wait, e.g. AdaptiveLimiter.on_flood_wait
+        """
+        self.label = label
+        self.max_retries = max_retries
+        self.max_wait = max_wait
+        self.on_flood_wait = on_flood_wait
+        self._resume_at = {}  # {method class: time.monotonic() when calls may go again}
+        self.flood_waits = {}  # {method class: count}
+        self.lost_seconds = {}  # {method class: seconds callers were held back}
+
+    async def wait(self, method):
+        """Sleeps until `method` calls are allowed again."""
+        while True:
+            delay = self._resume_at.get(method, 0) - time.monotonic()
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+
+    def pause(self, method, seconds):
+        """Holds back every `method` call for `seconds`. Overlapping pauses are only counted once."""
+        now = time.monotonic()
+        current = max(self._resume_at.get(method, 0), now)
+        resume_at = now + seconds
+        if resume_at > current:
+            self._resume_at[method] = resume_at
+            self.lost_seconds[method] = self.lost_seconds.get(method, 0) + (resume_at - current)
+
+    def _on_flood(self, method, error, attempt):
+        self.flood_waits[method] = self.flood_waits.get(method, 0) + 1
+        if self.on_flood_wait:
+            self.on_flood_wait(error.seconds)
+        if error.seconds > self.max_wait:
+            print(f"⛔ {self.label}: FloodWait {error.seconds}s on {method} is too long to wait out, giving up")
+            return False
+        backoff = BACKOFF_BASE * (2 ** attempt) * random.uniform(1.0, 1.5)
+        # Other callers are held back even if this one gives up
+        self.pause(method, error.seconds + backoff)
+        if attempt >= self.max_retries:
+            print(f"⛔ {self.label}: FloodWait {error.seconds}s on {method}, giving up after {attempt} retries")
+            return False
+        print(f"⏳ {self.label}: FloodWait {error.seconds}s on {method}, "
+              f"pausing {method} calls (retry {attempt + 1}/{self.max_retries})")
+        return True
+
+    async def call(self, method, func, *args, **kwargs):
+        """
+        Awaits `func(*args, **kwargs)` as a `method` call, waiting out flood
+        waits and retrying. Raises the FloodWaitError once retries run out.
+        """
+        attempt = 0
+        while True:
+            await self.wait(method)
+            try:
+                return await func(*args, **kwargs)
+            except errors.FloodWaitError as e:
+                if not self._on_flood(method, e, attempt):
+                    raise
+                attempt += 1
+
+    async def backoff(self, method, error, attempt=0):
+        """
+        For calls that cannot be wrapped by call() (e.g. resumable iterators):
+        records `error`, waits until `method` may go again and returns True,
+        or returns False if the caller should give up.
+        """
+        if not self._on_flood(method, error, attempt):
+            return False
+        await self.wait(method)
+        return True
+
+    def snapshot(self):
+        return {
+            "flood_waits": sum(self.flood_waits.values()),
+            "lost_seconds": sum(self.lost_seconds.values()),
+            "by_method": {
+                method: {"flood_waits": count, "lost_seconds": self.lost_seconds.get(method, 0)}
+                for method, count in self.flood_waits.items()
+            },
+        }
@@ -0,0 +1,165 @@
+"""
+Reusable FTP control connections for uploads.
+
+Logging in and walking the remote directory tree for every file costs
+several round trips per upload. FTPPool keeps logged-in connections per
+(host, user) and hands each caller one of its own; connections that sat
+idle for a while are checked with NOOP before they are reused, and broken
+ones are dropped. Remote directories known to exist are remembered per
+(host, user), so later uploads to the same folder skip the cwd/mkd walk.
+"""
+import ftplib
+import threading
+import time
+from contextlib import contextmanager
+
+# Idle connections kept per (host, user); more can be open at once, extras are closed on release
+FTP_MAX_IDLE = 8
+# Connections idle longer than this are NOOP-checked before reuse...
+FTP_HEALTH_CHECK_AFTER = 10
+# ...and closed instead once they are this old (servers drop idle control connections)
+FTP_MAX_IDLE_TIME = 240
+# Socket timeout for control and data connections, in seconds
+FTP_TIMEOUT = 60
+
+# Errors meaning the connection itself is unusable
+CONNECTION_ERRORS = (OSError, EOFError, ftplib.error_temp, ftplib.error_reply)
+
+
+class FTPPool:
+    def __init__(self, max_idle=FTP_MAX_IDLE, timeout=FTP_TIMEOUT):
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self._idle = {}  # {(host, user): [(ftp, released_at)]}, most recently released last
+        self._dirs = {}  # {(host, user): set of remote directories known to exist}
+        self._lock = threading.Lock()
+        self.logins = 0
+        self.reuses = 0
+        self.dropped = 0
+
+    def acquire(self, host, user, password):
+        """A logged-in connection for exclusive use; give it back with release()."""
+        key = (host, user)
+        while True:
+            with self._lock:
+                idle = self._idle.get(key)
+                ftp, released_at = idle.pop() if idle else (None, None)
+            if ftp is None:
+                break
+            idle_for = time.monotonic() - released_at
+            if idle_for <= FTP_HEALTH_CHECK_AFTER or (idle_for <= FTP_MAX_IDLE_TIME and self._healthy(ftp)):
+                with self._lock:
+                    self.reuses += 1
+                ftp.reused = True
+                return ftp
+            self._drop(ftp)
+
+        ftp = ftplib.FTP(host, timeout=self.timeout)
+        try:
+            ftp.login(user, password)
+            ftp.home = ftp.pwd()  # login directory, where uploads without a folder go
+        except Exception:
+            self._drop(ftp)
+            raise
+        ftp.cwd_path = ftp.home  # tracked so unchanged directories cost no round trip
+        ftp.reused = False
+        with self._lock:
+            self.logins += 1
+        return ftp
+
+    def release(self, host, user, ftp, broken=False):
+        """Returns `ftp` to the pool, or closes it if `broken` or the pool is full."""
+        if not broken:
+            with self._lock:
+                idle = self._idle.setdefault((host, user), [])
+                if len(idle) < self.max_idle:
+                    idle.append((ftp, time.monotonic()))
+                    return
+        self._drop(ftp, graceful=not broken)
+
+    @contextmanager
+    def connection(self, host, user, password):
+        """with pool.connection(...) as ftp: ... -- dropped instead of reused if the block raises."""
+        ftp = self.acquire(host, user, password)
+        try:
+            yield ftp
+        except Exception:
+            self.release(host, user, ftp, broken=True)
+            raise
+        self.release(host, user, ftp)
+
+    def change_dir(self, ftp, host, user, remote_dir):
+        """
+        Makes `remote_dir` the connection's working directory, creating missing
+        folders. "", "." and "/" mean the login directory.
+        """
+        target = ftp.home if remote_dir in ("", ".", "/") else "/" + remote_dir.strip("/")
+        if getattr(ftp, "cwd_path", None) == target:
+            return
+        key = (host, user)
+        with self._lock:
+            known = target in self._dirs.get(key, ())
+        if known:
+            try:
+                ftp.cwd(target)
+                ftp.cwd_path = target
+                return
+            except ftplib.error_perm:
+                # Removed on the server since; forget it and walk again
+                with self._lock:
+                    self._dirs.get(key, set()).discard(target)
+
+        if target != ftp.home:
+            current_path = ""
+            for part in target.strip("/").split("/"):
+                current_path = f"{current_path}/{part}"
+                with self._lock:
+                    if current_path in self._dirs.get(key, ()):
+                        continue
+                try:
+                    ftp.cwd(current_path)
+                except ftplib.error_perm:
+                    try:
+                        ftp.mkd(current_path)
+                    except ftplib.error_perm as e_mkd:
+                        # Created by someone else in the meantime is fine
+                        if not ("550" in str(e_mkd) and "exist" in str(e_mkd)):
+                            raise
+                with self._lock:
+                    self._dirs.setdefault(key, set()).add(current_path)
+        ftp.cwd(target)
+        ftp.cwd_path = target
+
+    def _healthy(self, ftp):
+        try:
+            ftp.voidcmd("NOOP")
+            return True
+        except Exception:
+            return False
+
+    def _drop(self, ftp, graceful=False):
+        """
+        Closes `ftp`. Only healthy connections are logged out with QUIT; on a
+        dead socket that would block for the whole timeout.
+        """
+        with self._lock:
+            self.dropped += 1
+        if graceful:
+            try:
+                ftp.quit()
+                return
+            except Exception:
+                pass
+        ftp.close()
+
+    def close(self):
+        """Logs out every idle connection."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for ftp, released_at in connections:
+                # Long-idle ones were probably dropped by the server already
+                self._drop(ftp, graceful=time.monotonic() - released_at <= FTP_MAX_IDLE_TIME)
+
+    def report(self, label="FTP pool"):
+        print(f"🔌 {label}: {self.logins} logins, {self.reuses} reused connections, {self.dropped} closed")
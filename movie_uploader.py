@@ -10,9 +10,14 @@ import os
 import sys
 import time
 import csv
+import queue
+import threading
+from concurrent.futures import as_completed
 from pathlib import Path
 from dotenv import load_dotenv
-from fileMoon import FileMoon
+from fileMoon import FileMoon, ResponseCache
+from file_code_resolver import FileCodeResolver
+from transfer_progress import TransferProgress
 
 # Load environment variables
 load_dotenv()
@@ -30,6 +35,17 @@ CSV_FILE = "filemoon_files.csv"
 VIDEO_EXTENSIONS = ('.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv', '.webm')
 SUBTITLE_EXTENSIONS = ('.srt', '.vtt', '.sub', '.ass')
 
+# Parallel FTP upload streams; each worker uploads over its own pooled connection
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", "3"))
+# Upper bound for a requested number of workers (also the FTP pool's idle connections per host)
+UPLOAD_WORKERS_MAX = 8
+
+# update_csv rewrites the whole file, so concurrent updates must not interleave
+csv_lock = threading.Lock()
+
+# Upload progress is sampled and printed by one reporter thread instead of on every FTP block
+upload_progress = TransferProgress(label="Uploads")
+
 def get_ftp_credentials():
     """Get FTP credentials from environment variables"""
     # FileMoon FTP credentials are typically:
@@ -64,8 +80,14 @@ def find_subtitle_for_video(video_path):
     
     return None
 
-def upload_video_to_filemoon(filemoon_client, video_path, ftp_creds, progress_callback=None):
-    """Upload video file to FileMoon via FTP"""
+def upload_video_to_filemoon(filemoon_client, video_path, ftp_creds, progress_callback=None, resolver=None):
+    """
+    Upload video file to FileMoon via FTP.
+
+    With a running FileCodeResolver, returns right after the FTP upload with a
+    Future for the file code, so the caller can move on to the next file.
+    Without one, waits for the code and returns it. None if the upload failed.
+    """
     filename = os.path.basename(video_path)
     file_size = os.path.getsize(video_path)
     file_size_mb = file_size / (1024 * 1024)
@@ -78,62 +100,192 @@ def upload_video_to_filemoon(filemoon_client, video_path, ftp_creds, progress_ca
     # Remote path on FTP server
     remote_path = f"/{filename}"
     
-    # Default Progress callback if none provided
+    slot = upload_progress.open(filename, file_size)
+
+    # Default Progress callback: record bytes in the shared slot, then chain the caller's callback
     def default_progress_callback(current, total, fname):
-        percent = (current / total) * 100
-        mb_current = current / (1024 * 1024)
-        mb_total = total / (1024 * 1024)
-        print(f"\r⏳ Progress: {percent:.1f}% ({mb_current:.1f}/{mb_total:.1f} MB)", end='', flush=True)
+        slot.update(current, total)
         if progress_callback:
             progress_callback(current, total, fname)
     
     try:
-        success = filemoon_client.ftp_upload(
-            local_file_path=video_path,
-            ftp_host=ftp_creds['host'],
-            ftp_user=ftp_creds['user'],
-            ftp_pass=ftp_creds['pass'],
-            remote_file_path=remote_path,
-            progress_callback=default_progress_callback
-        )
+        try:
+            success = filemoon_client.ftp_upload(
+                local_file_path=video_path,
+                ftp_host=ftp_creds['host'],
+                ftp_user=ftp_creds['user'],
+                ftp_pass=ftp_creds['pass'],
+                remote_file_path=remote_path,
+                progress_callback=default_progress_callback
+            )
+        finally:
+            upload_progress.close(slot)
         
-        print()  # New line after progress
-        
-        if success:
-            print(f"✅ Video uploaded successfully!")
-            
-            # Wait for FileMoon to process the file (indexing delay)
-            print("⏳ Waiting 15s for FileMoon to index the file...")
-            time.sleep(15)
-            
-            # Retry loop to get file info (FileMoon API can be slow to reflect new uploads)
-            for attempt in range(3):
-                print(f"🔍 Retrieval attempt {attempt + 1}/3...")
-                file_list = filemoon_client.f_list(name=filename)
-                if file_list.get('result') and file_list['result'].get('files'):
-                    files = file_list['result']['files']
-                    # Sort by created if multiple found, or just take first
-                    if files:
-                        file_code = files[0].get('file_code')
-                        print(f"✅ File code retrieved: {file_code}")
-                        return file_code
-                
-                if attempt < 2:
-                    print("⚠️ Not found yet, waiting 10s before retry...")
-                    time.sleep(10)
-            
-            print("❌ Failed to retrieve file code after multiple attempts.")
-            return None
-        else:
+        if not success:
             print(f"❌ Upload failed")
             return None
+
+        print(f"✅ Video uploaded successfully!")
+        if resolver is not None:
+            print("⏳ File code will be picked up once FileMoon has indexed the file")
+            return resolver.register(filename)
+
+        # No shared resolver: wait for this one file
+        resolver = FileCodeResolver(filemoon_client).start()
+        try:
+            print("⏳ Waiting for FileMoon to index the file...")
+            return resolver.register(filename).result()
+        finally:
+            resolver.stop()
             
     except Exception as e:
         print(f"\n❌ Upload error: {e}")
         return None
 
+def finished_uploads(pending, wait=False):
+    """
+    Yields (video_file, video_path, file_code) for the uploads in `pending`
+    ({future: (video_file, video_path)}) whose file code is settled, removing
+    them from it. With wait=True, blocks until every one has settled.
+    """
+    futures = as_completed(list(pending)) if wait else [f for f in list(pending) if f.done()]
+    for future in futures:
+        video_file, video_path = pending.pop(future)
+        yield video_file, video_path, future.result()
+
+def finish_upload(video_file, video_path, file_code, upload_subtitles=True, delete_after=False, subtitle_delay=0):
+    """
+    CSV entry, subtitle and clean-up for a video whose file code is known.
+    Returns {"file", "uploaded", "file_code", "subtitle", "subtitle_uploaded"};
+    "subtitle" is None (skipped), "uploaded", "failed" or "not_found".
+    """
+    result = {"file": video_file, "uploaded": bool(file_code), "file_code": file_code,
+              "subtitle": None, "subtitle_uploaded": False}
+    if not file_code:
+        return result
+
+    update_csv(video_file, file_code)
+
+    if upload_subtitles:
+        subtitle_path = find_subtitle_for_video(video_path)
+        if subtitle_path:
+            print(f"📝 Found subtitle: {os.path.basename(subtitle_path)}")
+            if subtitle_delay:
+                time.sleep(subtitle_delay)
+            if upload_subtitle_for_video(video_file, subtitle_path):
+                result["subtitle"] = "uploaded"
+                result["subtitle_uploaded"] = True
+                if delete_after:
+                    try:
+                        os.remove(subtitle_path)
+                        print(f"🗑️ Deleted local subtitle: {os.path.basename(subtitle_path)}")
+                    except Exception as e:
+                        print(f"⚠️ Error deleting subtitle: {e}")
+            else:
+                result["subtitle"] = "failed"
+        else:
+            print("⚠️ No subtitle file found for this video")
+            result["subtitle"] = "not_found"
+
+    # Delete video only once its upload is confirmed by the file code
+    if delete_after:
+        try:
+            os.remove(video_path)
+            print(f"🗑️ Deleted local video: {video_file}")
+        except Exception as e:
+            print(f"⚠️ Error deleting video: {e}")
+    return result
+
+def upload_videos(filemoon_client, video_files, ftp_creds, finish, workers=UPLOAD_WORKERS,
+                  resolver=None, on_worker=None, on_progress=None):
+    """
+    Uploads `video_files` (paths relative to MOVIE_DIR) over `workers` parallel
+    FTP streams. Workers move straight on to their next file while file codes
+    are resolved in the background. finish(video_file, video_path, file_code)
+    runs in the calling thread for every file once its code is known (None if
+    the upload or the lookup failed), so subtitle uploads stay one at a time.
+
+    on_worker(worker, index, video_file) is called from a worker when it picks
+    up a file, and with (worker, None, None) when it runs out of files;
+    on_progress(worker, video_file, current, total) as its upload proceeds.
+    """
+    own_resolver = resolver is None
+    if own_resolver:
+        resolver = FileCodeResolver(filemoon_client).start()
+    files = queue.Queue()
+    for idx, video_file in enumerate(video_files, 1):
+        files.put((idx, video_file))
+    uploaded = queue.Queue()  # (video_file, video_path, file code future or None) from the workers
+
+    def work(worker):
+        while True:
+            try:
+                idx, video_file = files.get_nowait()
+            except queue.Empty:
+                if on_worker:
+                    try:
+                        on_worker(worker, None, None)
+                    except Exception as e:
+                        print(f"⚠️ Worker {worker} status callback failed: {e}")
+                return
+            video_path = os.path.join(MOVIE_DIR, video_file)
+
+            def progress_cb(current, total, fname, video_file=video_file):
+                if on_progress:
+                    on_progress(worker, video_file, current, total)
+
+            future = None
+            try:
+                # Inside the try: every file taken from the queue must be reported back to the caller
+                if on_worker:
+                    on_worker(worker, idx, video_file)
+                print(f"\n🧵 Worker {worker} - {idx}/{len(video_files)}: {video_file}")
+                future = upload_video_to_filemoon(
+                    filemoon_client, video_path, ftp_creds, progress_callback=progress_cb, resolver=resolver
+                )
+            except Exception as e:
+                print(f"❌ Worker {worker} failed on {video_file}: {e}")
+            finally:
+                uploaded.put((video_file, video_path, future))
+
+    workers = max(1, min(workers, len(video_files)))
+    threads = [threading.Thread(target=work, args=(n,), name=f"upload-{n}", daemon=True)
+               for n in range(1, workers + 1)]
+    for thread in threads:
+        thread.start()
+
+    pending = {}  # {file code future: (video_file, video_path)}
+    try:
+        for _ in video_files:
+            # Finish whatever has been indexed while waiting for the next upload to end
+            while True:
+                try:
+                    video_file, video_path, future = uploaded.get(timeout=1)
+                    break
+                except queue.Empty:
+                    for done in finished_uploads(pending):
+                        finish(*done)
+            if future is None:
+                finish(video_file, video_path, None)
+            else:
+                pending[future] = (video_file, video_path)
+            for done in finished_uploads(pending):
+                finish(*done)
+
+        if pending:
+            print(f"\n⏳ Waiting for the file codes of {len(pending)} upload(s)...")
+        for done in finished_uploads(pending, wait=True):
+            finish(*done)
+    finally:
+        if own_resolver:
+            resolver.stop()
+
 def update_csv(video_filename, file_code):
-    """Update or create CSV with uploaded file info"""
+    """Update or create CSV with uploaded file info (safe to call from several threads)"""
+    with csv_lock:
+        _update_csv(video_filename, file_code)
+
+def _update_csv(video_filename, file_code):
     csv_exists = os.path.exists(CSV_FILE)
     
     # Read existing data
@@ -219,7 +371,9 @@ def main():
     parser.add_argument("--skip-subtitles", action="store_true", help="Skip subtitle upload")
     parser.add_argument("--video-only", action="store_true", help="Only upload videos without subtitles")
     parser.add_argument("--delete", action="store_true", help="Delete local files after successful upload")
+    parser.add_argument("--workers", type=int, default=UPLOAD_WORKERS, help=f"Parallel FTP uploads, 1-{UPLOAD_WORKERS_MAX} (default: {UPLOAD_WORKERS})")
     args = parser.parse_args()
+    args.workers = max(1, min(args.workers, UPLOAD_WORKERS_MAX))
     
     # Validate configuration
     if not FILEMOON_API_KEY:
@@ -233,7 +387,8 @@ def main():
     
     # Initialize FileMoon client
     print("🚀 Initializing FileMoon client...")
-    filemoon = FileMoon(FILEMOON_API_KEY)
+    # Cache read-only lookups; uploads invalidate what they change
+    filemoon = FileMoon(FILEMOON_API_KEY, cache=ResponseCache())
     
     # Get FTP credentials from environment
     print("🔑 Getting FTP credentials...")
@@ -270,63 +425,29 @@ def main():
         "subtitles_not_found": 0
     }
     
-    # Process each video
-    for idx, video_file in enumerate(video_files, 1):
-        print(f"\n{'#'*60}")
-        print(f"Processing {idx}/{len(video_files)}: {video_file}")
-        print(f"{'#'*60}")
-        
-        video_path = os.path.join(MOVIE_DIR, video_file)
-        
-        # Upload video
-        file_code = upload_video_to_filemoon(filemoon, video_path, ftp_creds)
-        
-        if file_code:
+    upload_progress.start_reporter()
+
+    def record(video_file, video_path, file_code):
+        result = finish_upload(
+            video_file, video_path, file_code,
+            upload_subtitles=not args.skip_subtitles and not args.video_only,
+            delete_after=args.delete,
+            subtitle_delay=3,
+        )
+        if result["uploaded"]:
             stats["videos_uploaded"] += 1
-            
-            # Update CSV
-            update_csv(video_file, file_code)
-            
-            # Upload subtitle if available and not skipped
-            if not args.skip_subtitles and not args.video_only:
-                subtitle_path = find_subtitle_for_video(video_path)
-                
-                if subtitle_path:
-                    print(f"📝 Found subtitle: {os.path.basename(subtitle_path)}")
-                    
-                    # Wait a bit before uploading subtitle
-                    time.sleep(3)
-                    
-                    if upload_subtitle_for_video(video_file, subtitle_path):
-                        stats["subtitles_uploaded"] += 1
-                        # Delete subtitle if --delete is set
-                        if args.delete:
-                            try:
-                                os.remove(subtitle_path)
-                                print(f"🗑️ Deleted local subtitle: {os.path.basename(subtitle_path)}")
-                            except Exception as e:
-                                print(f"⚠️ Error deleting subtitle: {e}")
-                    else:
-                        stats["subtitles_failed"] += 1
-                else:
-                    print("⚠️ No subtitle file found for this video")
-                    stats["subtitles_not_found"] += 1
-            
-            # Delete video if --delete is set and video upload was successful
-            if args.delete:
-                try:
-                    os.remove(video_path)
-                    print(f"🗑️ Deleted local video: {video_file}")
-                except Exception as e:
-                    print(f"⚠️ Error deleting video: {e}")
         else:
             stats["videos_failed"] += 1
-        
-        # Small delay between uploads
-        if idx < len(video_files):
-            print("\n⏳ Waiting before next upload...")
-            time.sleep(5)
-    
+        if result["subtitle"]:
+            stats[{"uploaded": "subtitles_uploaded", "failed": "subtitles_failed",
+                   "not_found": "subtitles_not_found"}[result["subtitle"]]] += 1
+
+    print(f"🧵 Uploading with {max(1, min(args.workers, len(video_files)))} parallel stream(s)")
+    try:
+        upload_videos(filemoon, video_files, ftp_creds, record, workers=args.workers)
+    finally:
+        upload_progress.stop_reporter()
+
     # Final summary
     print(f"\n{'='*60}")
     print("📊 UPLOAD SUMMARY")
@@ -340,6 +461,9 @@ def main():
         print(f"Subtitles not found: {stats['subtitles_not_found']}")
     
     print(f"{'='*60}")
+    filemoon.cache.report()
+    filemoon.rate_limiter.report("FileMoon API")
+    filemoon.ftp_pool.report()
     print("✅ Upload process completed!")
 
 if __name__ == "__main__":
@@ -0,0 +1,110 @@
+"""
+Token-bucket rate limiting shared by threads and asyncio tasks.
+
+Each group (e.g. a family of API endpoints) has a bucket refilled at `rate`
+tokens per second, holding at most `burst`. A call takes one token; when
+none is left the caller waits until its token accrues. Reservations are
+made under a lock and the waiting happens outside it, so the same limiter
+can be used from worker threads (acquire) and from event loops
+(acquire_async) at once.
+
+When the server says to slow down (HTTP 429, Retry-After, error JSON),
+penalize() holds back every caller of that group for the given time.
+"""
+import asyncio
+import threading
+import time
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def reserve(self, now):
+        """Takes a token (possibly going into debt). Returns seconds to wait before using it."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        delay = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(delay, self.blocked_until - now)
+
+
+class RateLimiter:
+    def __init__(self, limits, default_group="default"):
+        """
+        Args:
+            limits (dict): {group: (requests per second, burst)}
+            default_group (str): group used for names not in `limits`
+        """
+        self.default_group = default_group
+        self._buckets = {group: TokenBucket(rate, burst) for group, (rate, burst) in limits.items()}
+        self._lock = threading.Lock()
+        self.calls = {}
+        self.waited = {}  # {group: total seconds callers spent waiting}
+        self.penalties = {}  # {group: number of slow-down hints received}
+
+    def _bucket(self, group):
+        return self._buckets.get(group) or self._buckets[self.default_group]
+
+    def _reserve(self, group):
+        with self._lock:
+            self.calls[group] = self.calls.get(group, 0) + 1
+            return self._bucket(group).reserve(time.monotonic())
+
+    def _blocked_for(self, group):
+        with self._lock:
+            return self._bucket(group).blocked_until - time.monotonic()
+
+    def _record_wait(self, group, seconds):
+        if seconds > 0:
+            with self._lock:
+                self.waited[group] = self.waited.get(group, 0.0) + seconds
+
+    def acquire(self, group):
+        """Blocks the calling thread until a `group` call may be made."""
+        started = time.monotonic()
+        delay = self._reserve(group)
+        while delay > 0:
+            time.sleep(delay)
+            # A penalty may have arrived while we slept
+            delay = self._blocked_for(group)
+        self._record_wait(group, time.monotonic() - started)
+
+    async def acquire_async(self, group):
+        """Like acquire(), without blocking the event loop."""
+        started = time.monotonic()
+        delay = self._reserve(group)
+        while delay > 0:
+            await asyncio.sleep(delay)
+            delay = self._blocked_for(group)
+        self._record_wait(group, time.monotonic() - started)
+
+    def penalize(self, group, seconds):
+        """Holds back every `group` caller for `seconds`, and restarts the bucket empty afterwards."""
+        with self._lock:
+            self.penalties[group] = self.penalties.get(group, 0) + 1
+            bucket = self._bucket(group)
+            bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + seconds)
+            # No tokens accrue while blocked, so callers trickle back at `rate` instead of bursting
+            bucket.tokens = min(bucket.tokens, 0)
+            bucket.updated = max(bucket.updated, bucket.blocked_until)
+
+    def stats(self):
+        with self._lock:
+            return {
+                group: {
+                    "calls": calls,
+                    "waited": self.waited.get(group, 0.0),
+                    "penalties": self.penalties.get(group, 0),
+                }
+                for group, calls in self.calls.items()
+            }
+
+    def report(self, label="Rate limiter"):
+        for group, entry in sorted(self.stats().items()):
+            print(f"🚦 {label} [{group}]: {entry['calls']} calls, "
+                  f"{entry['waited']:.1f}s waited, {entry['penalties']} slow-down hints")
@@ -0,0 +1,120 @@
+import json
+import os
+
+# Runs in which a message may fail before it is given up on, so it stops holding the watermark back
+MAX_ATTEMPTS = 3
+
+
+class ScanCheckpoint:
+    """
+    Persists how far app.py got through a chat, so the next run only fetches
+    messages newer than the last fully processed one.
+
+    The saved `last_message_id` is a low watermark: every message with an id
+    at or below it has been processed. Messages still downloading or that
+    failed keep the watermark below them, so they are picked up again next
+    run. `completed_ids` holds the processed ids above the watermark, which
+    lets a resumed scan skip them without touching the filesystem.
+
+    Failures are counted across runs in `failed_attempts`. A message that
+    failed MAX_ATTEMPTS times is recorded in `given_up_ids` and treated as
+    processed, so one broken message cannot pin the watermark (and make
+    `completed_ids` grow) forever.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.last_message_id = 0
+        self.completed_ids = set()
+        self._highest_seen = 0
+        self._in_flight = set()
+        self._failed = set()
+        self.failed_attempts = {}  # {msg_id: runs in which it failed}
+        self.given_up_ids = set()
+
+    def load(self):
+        """Loads the checkpoint from disk. A missing or corrupt file starts from scratch."""
+        if not os.path.exists(self.path):
+            return self
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            self.last_message_id = int(state.get("last_message_id", 0))
+            self.completed_ids = {int(i) for i in state.get("completed_ids", [])}
+            self.failed_attempts = {int(i): int(n) for i, n in state.get("failed_attempts", {}).items()}
+            self.given_up_ids = {int(i) for i in state.get("given_up_ids", [])}
+            self._highest_seen = self.last_message_id
+        except (OSError, ValueError, TypeError) as e:
+            print(f"⚠️ Ignoring unreadable scan state '{self.path}': {e}")
+            self.last_message_id = 0
+            self.completed_ids = set()
+            self.failed_attempts = {}
+            self.given_up_ids = set()
+        return self
+
+    def reset(self):
+        """Forgets the stored position (used for a forced full rescan)."""
+        self.last_message_id = 0
+        self.completed_ids = set()
+        self._highest_seen = 0
+        self.failed_attempts = {}
+        self.given_up_ids = set()
+
+    def is_completed(self, msg_id):
+        return msg_id <= self.last_message_id or msg_id in self.completed_ids
+
+    def seen(self, msg_id):
+        """Records a scanned message that needs no processing (already completed)."""
+        if msg_id > self._highest_seen:
+            self._highest_seen = msg_id
+        self._advance()
+
+    def start(self, msg_id):
+        """Marks a scanned message as queued for processing."""
+        self._in_flight.add(msg_id)
+        if msg_id > self._highest_seen:
+            self._highest_seen = msg_id
+
+    def finish(self, msg_id, ok=True):
+        """
+        Marks a message as processed. Failed messages hold the watermark back,
+        until they have failed MAX_ATTEMPTS times. Interrupted messages must
+        not be finished at all; they stay in flight and are retried next run.
+        """
+        self._in_flight.discard(msg_id)
+        if not ok:
+            attempts = self.failed_attempts.get(msg_id, 0) + 1
+            if attempts < MAX_ATTEMPTS:
+                self.failed_attempts[msg_id] = attempts
+                self._failed.add(msg_id)
+                self._advance()
+                return
+            print(f"⚠️ Giving up on message {msg_id} after {attempts} failed attempts")
+            self.given_up_ids.add(msg_id)
+        self.failed_attempts.pop(msg_id, None)
+        self._failed.discard(msg_id)
+        self.completed_ids.add(msg_id)
+        self._advance()
+
+    def _advance(self):
+        pending = self._in_flight | self._failed
+        watermark = (min(pending) - 1) if pending else self._highest_seen
+        if watermark > self.last_message_id:
+            self.last_message_id = watermark
+            self.completed_ids = {i for i in self.completed_ids if i > watermark}
+
+    def save(self):
+        """Writes the checkpoint atomically (temp file + rename)."""
+        state = {
+            "last_message_id": self.last_message_id,
+            "completed_ids": sorted(self.completed_ids),
+            "failed_attempts": {str(i): n for i, n in sorted(self.failed_attempts.items())},
+            "given_up_ids": sorted(self.given_up_ids),
+        }
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"⚠️ Failed to save scan state '{self.path}': {e}")
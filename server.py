@@ -14,6 +14,7 @@ import filemoon_subtitle_uploader
 import update_csv
 import db_utils
 from fileMoon import FileMoon
+from file_code_resolver import FileCodeResolver
 
 # Load environment variables
 load_dotenv()
@@ -189,17 +190,23 @@ import threading
 # Global state for upload progress
 upload_status = {
     "is_uploading": False,
-    "current_file": "",
-    "current_index": 0,
+    "current_index": 0,  # files picked up by a worker so far
     "total_files": 0,
-    "current_file_percent": 0,
+    "workers": [],  # [{"worker", "file", "percent"}], one per parallel upload stream
+    "awaiting_codes": 0,  # uploaded files whose FileMoon file code is not known yet
     "results": []
 }
+# Upload workers update upload_status concurrently with the status endpoint reading it
+upload_status_lock = threading.Lock()
 
-def run_upload_task(skip_subtitles, delete_after):
+def run_upload_task(skip_subtitles, delete_after, workers=movie_uploader.UPLOAD_WORKERS):
     global upload_status
-    upload_status["is_uploading"] = True
-    upload_status["results"] = []
+    with upload_status_lock:
+        upload_status["is_uploading"] = True
+        upload_status["current_index"] = 0
+        upload_status["workers"] = []
+        upload_status["results"] = []
+        upload_status["awaiting_codes"] = 0
     
     try:
         FILEMOON_API_KEY = os.getenv("FILEMOON_API_KEY")
@@ -208,55 +215,49 @@ def run_upload_task(skip_subtitles, delete_after):
         ftp_creds = movie_uploader.get_ftp_credentials()
         
         video_files = movie_uploader.get_all_video_files(MOVIE_DIR)
-        upload_status["total_files"] = len(video_files)
-        
-        for idx, video_file in enumerate(video_files):
-            upload_status["current_index"] = idx + 1
-            upload_status["current_file"] = video_file
-            upload_status["current_file_percent"] = 0
-            
-            # Absolute path for recursive uploads
-            video_path = os.path.join(MOVIE_DIR, video_file)
-            
-            def progress_cb(current, total, fname):
-                upload_status["current_file_percent"] = round((current / total) * 100, 1)
+        workers = max(1, min(workers, len(video_files)))
+        with upload_status_lock:
+            upload_status["total_files"] = len(video_files)
+            upload_status["workers"] = [{"worker": n, "file": "", "percent": 0} for n in range(1, workers + 1)]
+
+        # Codes of uploaded files are polled for in the background; each file is
+        # finished (CSV, subtitle, clean-up) once its code shows up
+        resolver = FileCodeResolver(filemoon).start()
+
+        def on_worker(worker, idx, video_file):
+            with upload_status_lock:
+                if video_file:
+                    upload_status["current_index"] += 1
+                upload_status["workers"][worker - 1].update(file=video_file or "", percent=0)
+                upload_status["awaiting_codes"] = resolver.waiting
+
+        def on_progress(worker, video_file, current, total):
+            with upload_status_lock:
+                upload_status["workers"][worker - 1]["percent"] = round((current / total) * 100, 1)
 
-            file_code = movie_uploader.upload_video_to_filemoon(
-                filemoon, video_path, ftp_creds, progress_callback=progress_cb
+        def finish(video_file, video_path, file_code):
+            result = movie_uploader.finish_upload(
+                video_file, video_path, file_code,
+                upload_subtitles=not skip_subtitles, delete_after=delete_after
             )
-            
-            result = {"file": video_file, "uploaded": False, "file_code": None, "subtitle_uploaded": False}
-            
-            if file_code:
-                result["uploaded"] = True
-                result["file_code"] = file_code
-                movie_uploader.update_csv(video_file, file_code)
-                
-                if not skip_subtitles:
-                    subtitle_path = movie_uploader.find_subtitle_for_video(video_path)
-                    if subtitle_path:
-                        sub_success = movie_uploader.upload_subtitle_for_video(video_file, subtitle_path)
-                        result["subtitle_uploaded"] = sub_success
-                        if sub_success and delete_after:
-                             try:
-                                 os.remove(subtitle_path)
-                                 print(f"🗑️ Deleted subtitle: {subtitle_path}")
-                             except Exception as e:
-                                 print(f"⚠️ Failed to delete sub {subtitle_path}: {e}")
-                
-                if delete_after:
-                    try:
-                        os.remove(video_path)
-                        print(f"🗑️ Deleted video: {video_path}")
-                    except Exception as e:
-                        print(f"⚠️ Failed to delete video {video_path}: {e}")
-            
-            upload_status["results"].append(result)
+            with upload_status_lock:
+                upload_status["results"].append(result)
+                upload_status["awaiting_codes"] = resolver.waiting
+
+        try:
+            movie_uploader.upload_videos(
+                filemoon, video_files, ftp_creds, finish, workers=workers,
+                resolver=resolver, on_worker=on_worker, on_progress=on_progress
+            )
+        finally:
+            resolver.stop()
             
     except Exception as e:
         print(f"Error in upload thread: {e}")
     finally:
-        upload_status["is_uploading"] = False
+        with upload_status_lock:
+            upload_status["is_uploading"] = False
+            upload_status["awaiting_codes"] = 0
 
 @app.route('/upload/movies', methods=['POST'])
 def upload_movies():
@@ -270,8 +271,13 @@ def upload_movies():
     skip_subtitles = data.get('skip_subtitles', False)
     # Default to True as requested
     delete_after = data.get('delete_after', True)
+    try:
+        workers = int(data.get('workers', movie_uploader.UPLOAD_WORKERS))
+    except (TypeError, ValueError):
+        return jsonify({"status": "error", "message": "'workers' must be a whole number"}), 400
+    workers = max(1, min(workers, movie_uploader.UPLOAD_WORKERS_MAX))
     
-    thread = threading.Thread(target=run_upload_task, args=(skip_subtitles, delete_after))
+    thread = threading.Thread(target=run_upload_task, args=(skip_subtitles, delete_after, workers))
     thread.start()
     
     return jsonify({"status": "success", "message": "Upload started in background"}), 202
@@ -281,7 +287,10 @@ def get_upload_status():
     """
     Polling endpoint for upload progress.
     """
-    return jsonify(upload_status), 200
+    with upload_status_lock:
+        snapshot = dict(upload_status, workers=[dict(w) for w in upload_status["workers"]],
+                        results=list(upload_status["results"]))
+    return jsonify(snapshot), 200
 
 
 
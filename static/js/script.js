@@ -203,10 +203,16 @@ async function triggerUpload() {
                 const status = await statusRes.json();
 
                 if (status.total_files > 0) {
-                    progFile.innerText = `Current: ${status.current_file}`;
+                    // Overall bar: finished files plus the share of the ones in flight
+                    const workers = status.workers || [];
+                    const inFlight = workers.reduce((sum, w) => sum + (w.file ? w.percent / 100 : 0), 0);
+                    const overall = Math.min(100, ((status.results.length + inFlight) / status.total_files) * 100).toFixed(1);
+                    const active = workers.filter(w => w.file).length;
+                    progFile.innerText = active ? `Uploading ${active} file(s)` : (status.awaiting_codes ? `Waiting for ${status.awaiting_codes} file code(s)` : 'Finishing...');
                     progCount.innerText = `${status.current_index}/${status.total_files}`;
-                    progBar.style.width = `${status.current_file_percent}%`;
-                    progPercent.innerText = `${status.current_file_percent}%`;
+                    progBar.style.width = `${overall}%`;
+                    progPercent.innerText = `${overall}%`;
+                    renderWorkerProgress(workers);
                 } else if (!status.is_uploading) {
                     progFile.innerText = 'No files found in downloads folder';
                 }
@@ -233,6 +239,7 @@ async function triggerUpload() {
 
                 if (!status.is_uploading) {
                     clearInterval(pollInterval);
+                    renderWorkerProgress([]);
                     log.innerText += '\nUpload session completed.\n';
 
                     if (status.results && status.results.length > 0) {
@@ -259,6 +266,35 @@ async function triggerUpload() {
     }
 }
 
+function renderWorkerProgress(workers) {
+    const container = document.getElementById('workerProgress');
+    if (!container) return;
+    container.innerHTML = '';
+    workers.forEach(w => {
+        // File names come from the uploads folder: set them as text, never as HTML
+        const row = document.createElement('div');
+        row.className = 'worker-row';
+
+        const info = document.createElement('div');
+        info.className = 'progress-info';
+        const name = document.createElement('span');
+        name.textContent = `Worker ${w.worker}: ${w.file || 'idle'}`;
+        const percent = document.createElement('span');
+        percent.textContent = w.file ? `${w.percent}%` : '';
+        info.append(name, percent);
+
+        const rail = document.createElement('div');
+        rail.className = 'progress-rail';
+        const fill = document.createElement('div');
+        fill.className = 'progress-fill';
+        fill.style.width = `${w.file ? Number(w.percent) || 0 : 0}%`;
+        rail.appendChild(fill);
+
+        row.append(info, rail);
+        container.appendChild(row);
+    });
+}
+
 // 6. Popular Titles Management
 let allTitles = [];
 
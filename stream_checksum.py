@@ -0,0 +1,92 @@
+"""
+Inline checksums for downloads.
+
+A StreamHasher is fed the chunks of a file as they are written, so a finished
+download has its digest without reading the file back. Chunks may arrive out
+of order (parallel downloads); those are buffered until the gap before them
+is filled, and anything that could not be buffered is read back from disk.
+
+Digests are strings like "xxh64:<hex>" (or "sha256:<hex>" when the optional
+xxhash package is not installed), so stored values say how they were made.
+"""
+import hashlib
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+CHECKSUM_ALGORITHM = "xxh64" if xxhash else "sha256"
+# Out-of-order bytes kept in memory; beyond this they are re-read from disk at the end
+MAX_PENDING_BYTES = 64 * 1024 * 1024
+READ_SIZE = 1024 * 1024
+
+
+def new_hash():
+    return xxhash.xxh64() if xxhash else hashlib.sha256()
+
+
+class StreamHasher:
+    def __init__(self, max_pending=MAX_PENDING_BYTES):
+        self.max_pending = max_pending
+        self.reset()
+
+    def reset(self):
+        """Starts over, e.g. when the file being hashed was discarded."""
+        self._hash = new_hash()
+        self.offset = 0  # bytes hashed so far, always a prefix of the file
+        self._pending = {}  # {offset: bytes} received ahead of self.offset
+        self._pending_bytes = 0
+
+    def feed(self, offset, data):
+        """Adds `data`, which was written at `offset`."""
+        if offset + len(data) <= self.offset:
+            return  # already hashed (a part fetched again)
+        if offset < self.offset:
+            data = data[self.offset - offset:]
+            offset = self.offset
+        if offset == self.offset:
+            self._update(data)
+            self._drain()
+        elif offset not in self._pending and self._pending_bytes + len(data) <= self.max_pending:
+            self._pending[offset] = data
+            self._pending_bytes += len(data)
+        # else: left for catch_up() to read back from the file
+
+    def catch_up(self, f, end):
+        """
+        Hashes [offset, end) of the open file `f`, using buffered chunks where
+        possible. Only bytes that were never fed (e.g. written by an earlier,
+        interrupted run) are read back.
+        """
+        while self.offset < end:
+            self._drain()
+            if self.offset >= end:
+                break
+            # Read up to the next buffered chunk, so it can be used as is
+            stop = min([end] + [o for o in self._pending if o > self.offset])
+            f.seek(self.offset)
+            data = f.read(min(READ_SIZE, stop - self.offset))
+            if not data:
+                raise IOError(f"unexpected end of file at {self.offset} while hashing")
+            self._update(data)
+        self._drain()
+
+    def _update(self, data):
+        self._hash.update(data)
+        self.offset += len(data)
+
+    def _drain(self):
+        while self._pending:
+            # Drop chunks that are now fully behind the hashed prefix
+            for offset in [o for o, d in self._pending.items() if o + len(d) <= self.offset]:
+                self._pending_bytes -= len(self._pending.pop(offset))
+            start = next((o for o in self._pending if o <= self.offset), None)
+            if start is None:
+                return
+            data = self._pending.pop(start)
+            self._pending_bytes -= len(data)
+            self._update(data[self.offset - start:])
+
+    def hexdigest(self):
+        return f"{CHECKSUM_ALGORITHM}:{self._hash.hexdigest()}"
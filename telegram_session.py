@@ -0,0 +1,175 @@
+"""
+Session storage and entity caching for the Telegram scripts.
+
+Session modes:
+    file    the usual SQLite `<name>.session`, kept open for the whole run
+            (Telethon's default; two scripts on the same file lock each other)
+    memory  the auth key is copied out of `<name>.session` (read-only) into an
+            in-memory session, so the file is never locked
+    string  a StringSession from the `<NAME>_STRING_SESSION` environment
+            variable or a `<name>.string_session` file; no session file needed
+
+Export a StringSession for an existing login with:
+    python telegram_session.py export series_session
+
+EntityCache keeps the access hashes of resolved chats in a small JSON file
+per session, so startup does not spend a round trip on `get_entity` (and
+`get_me`) for chats it has seen before. Delete the file to start over.
+"""
+import json
+import os
+import sqlite3
+
+from telethon import utils
+from telethon.crypto import AuthKey
+from telethon.sessions import StringSession
+from telethon.tl.types import InputPeerChannel, InputPeerChat, InputPeerUser
+
+SESSION_MODES = ("file", "memory", "string")
+DEFAULT_SESSION_MODE = os.getenv("TELEGRAM_SESSION_MODE", "file")
+ENTITY_CACHE_FILE = "{session}.entities.json"
+
+
+def _string_session_value(name):
+    value = os.getenv(f"{name.upper()}_STRING_SESSION")
+    if value:
+        return value.strip()
+    path = f"{name}.string_session"
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read().strip()
+    return None
+
+
+def memory_session_from_file(name):
+    """
+    Copies the login stored in `<name>.session` into an in-memory session
+    without taking a write lock on the file. Returns None if there is none.
+    """
+    path = f"{name}.session"
+    if not os.path.exists(path):
+        return None
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        row = conn.execute("SELECT dc_id, server_address, port, auth_key FROM sessions").fetchone()
+    except sqlite3.Error:
+        row = None
+    finally:
+        conn.close()
+    if not row or not row[3]:
+        return None
+    session = StringSession()
+    session.set_dc(row[0], row[1], row[2])
+    session.auth_key = AuthKey(row[3])
+    return session
+
+
+def open_session(name, mode=DEFAULT_SESSION_MODE):
+    """Returns what to pass as TelegramClient's `session` for session `name` in `mode`."""
+    if mode not in SESSION_MODES:
+        raise ValueError(f"Unknown session mode '{mode}'. Choose from: {', '.join(SESSION_MODES)}")
+    if mode == "string":
+        value = _string_session_value(name)
+        if value:
+            return StringSession(value)
+        print(f"⚠️ No string session for '{name}', falling back to an in-memory copy of {name}.session")
+        mode = "memory"
+    if mode == "memory":
+        session = memory_session_from_file(name)
+        if session is not None:
+            return session
+        print(f"⚠️ '{name}.session' has no login to copy, using the session file (login required once)")
+    return name
+
+
+class EntityCache:
+    def __init__(self, session_name, path=None):
+        self.path = path or ENTITY_CACHE_FILE.format(session=session_name)
+        self.peers = {}  # {str(chat): {"type", "id", "access_hash", "label"}}
+        self.me = None  # display name of the logged-in account
+
+    def load(self):
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self.peers = data.get("peers", {})
+                self.me = data.get("me")
+            except (OSError, ValueError):
+                print(f"⚠️ Ignoring unreadable entity cache {self.path}")
+        return self
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"me": self.me, "peers": self.peers}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def get(self, chat):
+        """Returns (input_peer, label) for a cached chat, or None."""
+        entry = self.peers.get(str(chat))
+        if not entry:
+            return None
+        if entry["type"] == "user":
+            peer = InputPeerUser(entry["id"], entry["access_hash"])
+        elif entry["type"] == "channel":
+            peer = InputPeerChannel(entry["id"], entry["access_hash"])
+        else:
+            peer = InputPeerChat(entry["id"])
+        return peer, entry["label"]
+
+    def put(self, chat, entity):
+        """Caches a resolved entity. Returns (input_peer, label) like get()."""
+        peer = utils.get_input_peer(entity)
+        label = getattr(entity, "title", None) or str(chat)
+        if isinstance(peer, InputPeerUser):
+            entry = {"type": "user", "id": peer.user_id, "access_hash": peer.access_hash}
+        elif isinstance(peer, InputPeerChannel):
+            entry = {"type": "channel", "id": peer.channel_id, "access_hash": peer.access_hash}
+        elif isinstance(peer, InputPeerChat):
+            entry = {"type": "chat", "id": peer.chat_id, "access_hash": None}
+        else:
+            return peer, label  # e.g. InputPeerSelf; nothing worth caching
+        entry["label"] = label
+        self.peers[str(chat)] = entry
+        self.save()
+        return peer, label
+
+    def forget(self, chat):
+        if self.peers.pop(str(chat), None) is not None:
+            self.save()
+
+    async def resolve(self, client, chat, governor=None):
+        """(input_peer, label) for `chat`, asking Telegram only if it is not cached."""
+        cached = self.get(chat)
+        if cached:
+            return cached
+        if governor:
+            entity = await governor.call("resolve", client.get_entity, chat)
+        else:
+            entity = await client.get_entity(chat)
+        return self.put(chat, entity)
+
+    async def resolve_me(self, client, governor=None):
+        """Display name of the logged-in account, cached after the first run."""
+        if self.me:
+            return self.me
+        if governor:
+            me = await governor.call("resolve", client.get_me)
+        else:
+            me = await client.get_me()
+        self.me = getattr(me, 'username', None) or getattr(me, 'first_name', None) or 'Unknown'
+        self.save()
+        return self.me
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Telegram session helpers")
+    parser.add_argument("command", choices=["export"], help="export: print a StringSession for an existing session file")
+    parser.add_argument("session", help="Session name, e.g. series_session")
+    args = parser.parse_args()
+    session = memory_session_from_file(args.session)
+    if session is None:
+        raise SystemExit(f"❌ '{args.session}.session' has no login to export")
+    print(StringSession.save(session))
@@ -0,0 +1,38 @@
+import asyncio
+from types import SimpleNamespace
+
+from telethon.tl.types import InputMessagesFilterDocument, InputMessagesFilterVideo
+
+import app
+
+
+class FakeClient:
+    def __init__(self, by_filter):
+        self.by_filter = by_filter
+
+    async def iter_messages(self, target, limit=None, reverse=False, min_id=0, filter=None):
+        for msg_id in sorted(self.by_filter[filter]):
+            if msg_id > min_id:
+                yield SimpleNamespace(id=msg_id)
+
+
+def _scan(client, min_id, scan_filter):
+    async def run():
+        return [msg.id async for msg in app.iter_scan_messages(client, "chat", min_id, app.SCAN_FILTERS[scan_filter])]
+    return asyncio.run(run())
+
+
+def test_media_scan_merges_documents_and_videos_by_id():
+    client = FakeClient({
+        InputMessagesFilterDocument: [2, 5, 6, 9],
+        InputMessagesFilterVideo: [1, 5, 7],
+    })
+    assert app.SCAN_FILTER == "media"
+    assert _scan(client, 0, "media") == [1, 2, 5, 6, 7, 9]
+    assert _scan(client, 5, "media") == [6, 7, 9]
+    assert _scan(client, 0, "video") == [1, 5, 7]
+
+
+def test_unfiltered_scan():
+    client = FakeClient({None: [3, 4]})
+    assert _scan(client, 0, "all") == [3, 4]
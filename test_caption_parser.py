@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+import bench_caption_parser
+from bench_caption_parser import EDGE_CAPTIONS, EDGE_FILENAMES, legacy_extract_episode_info, legacy_parse_filename_for_info
+from caption_parser import extract_episode_info, parse_filename_for_info
+
+
+@pytest.mark.parametrize("text", EDGE_CAPTIONS)
+def test_caption_matches_legacy_parser(text):
+    new, old = extract_episode_info(text), legacy_extract_episode_info(text)
+    assert new == old
+    assert list(new) == list(old)
+
+
+@pytest.mark.parametrize("filename", EDGE_FILENAMES)
+def test_filename_matches_legacy_parser(filename):
+    assert parse_filename_for_info(filename) == legacy_parse_filename_for_info(filename)
+
+
+def test_corpus_matches_legacy_parsers(monkeypatch):
+    monkeypatch.setattr(bench_caption_parser, "CSV_FILE",
+                        os.path.join(os.path.dirname(__file__), bench_caption_parser.CSV_FILE))
+    captions, filenames = bench_caption_parser.build_corpus()
+    bench_caption_parser.check(captions, filenames)
+
+
+def test_caption_fields():
+    text = bench_caption_parser.CAPTION_TEMPLATE.format(series="Dark", title="Secrets", episode=3, total=10)
+    info = extract_episode_info(text)
+    assert info["series"] == "Dark"
+    assert info["episode_title"] == "Secrets"
+    assert info["episode_number"] == "3"
+    assert info["total_episodes_in_season"] == "10"
+    assert "episode_number_raw" not in info
+
+
+def test_filename_fields():
+    assert parse_filename_for_info("Stranger.Things.S04E01.1080p.WEB.mkv") == {
+        "series": "Stranger Things", "season_number": "04", "episode_number": "01",
+    }
@@ -0,0 +1,46 @@
+from disk_budget import DiskBudget
+
+GB = 1024 * 1024 * 1024
+
+
+class FixedBudget(DiskBudget):
+    def __init__(self, free, margin=0):
+        super().__init__(".", margin=margin)
+        self._free = free
+
+    def free(self):
+        return self._free
+
+
+def test_reservations_reduce_available_space():
+    budget = FixedBudget(free=10 * GB, margin=2 * GB)
+    assert budget.available() == 8 * GB
+    first = budget.reserve(3 * GB)
+    budget.reserve(1 * GB)
+    assert budget.reserved == 4 * GB
+    assert budget.available() == 4 * GB
+    first.release()
+    assert budget.available() == 7 * GB
+
+
+def test_consume_moves_bytes_from_reserved_to_disk_usage():
+    budget = FixedBudget(free=10 * GB)
+    reservation = budget.reserve(3 * GB)
+    reservation.consume(1 * GB)
+    assert reservation.outstanding == 2 * GB
+    assert budget.reserved == 2 * GB
+    # More than was reserved (e.g. a size estimate that was too low) never goes negative
+    reservation.consume(5 * GB)
+    assert reservation.outstanding == 0
+    assert budget.reserved == 0
+    reservation.release()
+    assert budget.reserved == 0
+
+
+def test_release_after_partial_consume():
+    budget = FixedBudget(free=10 * GB)
+    reservation = budget.reserve(3 * GB)
+    reservation.consume(1 * GB)
+    reservation.release()
+    reservation.release()
+    assert budget.reserved == 0
@@ -0,0 +1,58 @@
+import os
+
+from download_registry import STATUS_COMPLETED, STATUS_FAILED, STATUS_MISSING, STATUS_UPLOADED, DownloadRegistry
+
+
+def _registry(tmp_path):
+    return DownloadRegistry(str(tmp_path / "registry.db")).load()
+
+
+def _record(registry, path, episode=1, status=STATUS_COMPLETED, document_id=100):
+    return registry.record("Dark", "01", episode, status, document_id=document_id, path=str(path), size=10)
+
+
+def test_completed_entries_are_skipped_without_touching_the_disk(tmp_path):
+    registry = _registry(tmp_path)
+    # The file never existed: skip decisions only look at the registry
+    _record(registry, tmp_path / "Dark_S01E01.mkv")
+    assert registry.is_downloaded("Dark", "01", 1)
+    assert registry.is_duplicate_document(100, 10)
+    assert not registry.is_duplicate_document(100, 11)
+    _record(registry, tmp_path / "Dark_S01E02.mkv", episode=2, status=STATUS_FAILED, document_id=101)
+    assert not registry.is_downloaded("Dark", "01", 2)
+    registry.close()
+
+
+def test_uploaded_episode_survives_a_restart(tmp_path):
+    path = tmp_path / "Dark_S01E01.mkv"
+    path.write_bytes(b"x" * 10)
+    registry = _registry(tmp_path)
+    _record(registry, path)
+    registry.set_season_total("Dark", "01", 8)
+    registry.close()
+
+    uploader = _registry(tmp_path)
+    assert uploader.mark_uploaded(os.path.join(str(tmp_path), ".", "Dark_S01E01.mkv"))
+    assert not uploader.mark_uploaded(str(tmp_path / "unknown.mkv"))
+    uploader.close()
+    os.remove(path)
+
+    registry = _registry(tmp_path)
+    assert registry.get_episode("Dark", "01", 1)["status"] == STATUS_UPLOADED
+    assert registry.is_downloaded("Dark", "01", 1)
+    assert registry.is_duplicate_document(100, 10)
+    assert registry.build_tracker() == {"Dark": {"01": {"episodes": {1}, "total_expected": 8}}}
+    # Nothing to re-download: the file was deleted because it was uploaded
+    assert registry.mark_missing_files() == 0
+    registry.close()
+
+
+def test_missing_files_are_only_redownloaded_on_request(tmp_path):
+    registry = _registry(tmp_path)
+    _record(registry, tmp_path / "gone.mkv")
+    assert registry.is_downloaded("Dark", "01", 1)
+    assert registry.mark_missing_files() == 1
+    assert registry.get_episode("Dark", "01", 1)["status"] == STATUS_MISSING
+    assert not registry.is_downloaded("Dark", "01", 1)
+    assert not registry.is_duplicate_document(100, 10)
+    registry.close()
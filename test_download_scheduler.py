@@ -0,0 +1,153 @@
+import asyncio
+
+import pytest
+
+import download_scheduler
+from adaptive_concurrency import AdaptiveLimiter
+from disk_budget import DiskBudget, InsufficientDiskSpace
+from download_scheduler import DownloadScheduler
+
+GB = 1024 * 1024 * 1024
+
+
+class FakeLimiter:
+    def __init__(self, limit=1):
+        self._sem = asyncio.Semaphore(limit)
+
+    async def acquire(self):
+        await self._sem.acquire()
+
+    def release(self):
+        self._sem.release()
+
+
+class FixedBudget(DiskBudget):
+    def __init__(self, free):
+        super().__init__(".", margin=0)
+        self._free = free
+
+    def free(self):
+        return self._free
+
+
+def _job(msg_id, size=1, series="Dark", season="01", episode=None, source=None, total=None, resumed=0, account=None):
+    return {"msg_id": msg_id, "series": series, "season": season, "episode": episode or msg_id,
+            "size": size, "total": total, "source": source, "resumed": resumed, "account": account}
+
+
+def _order(scheduler, jobs):
+    entries = [[job, None] for job in jobs]
+    picked = []
+    while entries:
+        best = scheduler._pick(entries)
+        entries.remove(best)
+        picked.append(best[0]["msg_id"])
+    return picked
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        DownloadScheduler(FakeLimiter(), {}, policy="random")
+
+
+@pytest.mark.parametrize("policy, expected", [
+    ("oldest", [1, 2, 3]),
+    ("newest", [3, 2, 1]),
+    ("smallest", [2, 3, 1]),
+])
+def test_simple_policies(policy, expected):
+    scheduler = DownloadScheduler(FakeLimiter(), {}, policy=policy)
+    jobs = [_job(1, size=300), _job(2, size=100), _job(3, size=200)]
+    assert _order(scheduler, jobs) == expected
+
+
+def test_complete_seasons_first():
+    tracker = {
+        "Dark": {"01": {"episodes": {1, 2, 3}, "total_expected": 4}},
+        "Lost": {"02": {"episodes": {1}, "total_expected": 10}},
+    }
+    scheduler = DownloadScheduler(FakeLimiter(), tracker, policy="complete_seasons")
+    jobs = [
+        _job(1, series="New", season="01", episode=1),
+        _job(2, series="Lost", season="02", episode=2),
+        _job(3, series="Dark", season="01", episode=4),
+    ]
+    # Dark S01 needs one more episode, Lost S02 nine, New hasn't started
+    assert _order(scheduler, jobs) == [3, 2, 1]
+
+
+def test_sources_take_turns():
+    scheduler = DownloadScheduler(FakeLimiter(), {}, policy="oldest")
+    jobs = [_job(i, source="busy") for i in range(1, 5)] + [_job(10, source="quiet"), _job(11, source="quiet")]
+    assert _order(scheduler, jobs) == [1, 10, 2, 11, 3, 4]
+
+
+def test_jobs_get_slots_by_policy():
+    async def run():
+        scheduler = DownloadScheduler(FakeLimiter(limit=1), {}, policy="smallest").start()
+        order = []
+
+        async def worker(job):
+            async with scheduler.slot(job):
+                order.append(job["msg_id"])
+                await asyncio.sleep(0)
+
+        await asyncio.gather(*(worker(_job(i, size=size)) for i, size in [(1, 30), (2, 10), (3, 20)]))
+        await scheduler.close()
+        return order
+
+    # All three are queued before the dispatcher hands out the single slot
+    assert asyncio.run(run()) == [2, 3, 1]
+
+
+def test_reservation_excludes_resumed_bytes():
+    async def run():
+        budget = FixedBudget(free=10 * GB)
+        scheduler = DownloadScheduler(FakeLimiter(), {}, budget=budget).start()
+        async with scheduler.slot(_job(1, size=8 * GB, resumed=6 * GB)) as reservation:
+            reserved = budget.reserved
+            assert reservation.outstanding == 2 * GB
+        await scheduler.close()
+        return reserved, budget.reserved
+
+    assert asyncio.run(run()) == (2 * GB, 0)
+
+
+def test_job_that_never_fits_fails(monkeypatch):
+    monkeypatch.setattr(download_scheduler, "DISK_RECHECK_INTERVAL", 0.01)
+    monkeypatch.setattr(download_scheduler, "DISK_WAIT_TIMEOUT", 0.05)
+
+    async def run():
+        scheduler = DownloadScheduler(FakeLimiter(), {}, budget=FixedBudget(free=1 * GB)).start()
+        try:
+            async with scheduler.slot(_job(1, size=5 * GB)):
+                pass
+        finally:
+            await scheduler.close()
+
+    with pytest.raises(InsufficientDiskSpace):
+        asyncio.run(asyncio.wait_for(run(), timeout=5))
+
+
+def test_account_cap_keeps_the_policy_order():
+    async def run():
+        account = AdaptiveLimiter(initial=1, min_limit=1, max_limit=1)
+        scheduler = DownloadScheduler(FakeLimiter(limit=5), {}, policy="smallest", accounts={"main": account}).start()
+        order = []
+        running = []
+
+        async def worker(job):
+            async with scheduler.slot(job):
+                order.append(job["msg_id"])
+                running.append(account.in_use)
+                await asyncio.sleep(0.01)
+
+        sizes = [50, 40, 30, 20, 10]
+        await asyncio.gather(*(worker(_job(i, size=size, account="main")) for i, size in enumerate(sizes, 1)))
+        await scheduler.close()
+        return order, running, account.in_use
+
+    order, running, in_use = asyncio.run(run())
+    assert order == [5, 4, 3, 2, 1]
+    assert running == [1] * 5
+    assert in_use == 0
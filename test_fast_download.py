@@ -0,0 +1,106 @@
+import asyncio
+import os
+from types import SimpleNamespace
+
+import pytest
+
+import fast_download
+from fast_download import PART_SUFFIX, SIDECAR_SUFFIX, PartState, resumed_bytes
+
+
+def _document(id=42, size=1000):
+    return SimpleNamespace(id=id, size=size)
+
+
+def test_add_merges_overlapping_and_adjacent_ranges(tmp_path):
+    state = PartState(str(tmp_path / "ep.part.json"), 42, 1000)
+    state.add(100, 200)
+    state.add(300, 400)
+    assert state.ranges == [[100, 200], [300, 400]]
+    state.add(200, 300)
+    assert state.ranges == [[100, 400]]
+    state.add(0, 50)
+    state.add(40, 120)
+    assert state.ranges == [[0, 400]]
+    assert state.covered == 400
+    assert state.contiguous_end == 400
+
+
+def test_has_and_contiguous_end(tmp_path):
+    state = PartState(str(tmp_path / "ep.part.json"), 42, 1000, ranges=[[100, 200]])
+    assert state.contiguous_end == 0
+    assert state.has(120, 180)
+    assert not state.has(150, 250)
+
+
+def test_sidecar_round_trip(tmp_path):
+    file_path = str(tmp_path / "ep.mkv")
+    open(file_path + PART_SUFFIX, "wb").close()
+    state = PartState(file_path + SIDECAR_SUFFIX, 42, 1000)
+    state.add(0, 300)
+    state.add(500, 600)
+    state.save()
+
+    loaded = PartState.load(file_path + PART_SUFFIX, _document())
+    assert loaded.ranges == [[0, 300], [500, 600]]
+
+
+def test_sidecar_of_another_document_starts_over(tmp_path):
+    file_path = str(tmp_path / "ep.mkv")
+    open(file_path + PART_SUFFIX, "wb").close()
+    state = PartState(file_path + SIDECAR_SUFFIX, 42, 1000)
+    state.add(0, 300)
+    state.save()
+
+    loaded = PartState.load(file_path + PART_SUFFIX, _document(id=7))
+    assert loaded.ranges == []
+    assert not os.path.exists(file_path + PART_SUFFIX)
+
+
+def test_resumed_bytes_only_counts_the_same_document(tmp_path):
+    file_path = str(tmp_path / "ep.mkv")
+    open(file_path + PART_SUFFIX, "wb").close()
+    state = PartState(file_path + SIDECAR_SUFFIX, 42, 1000)
+    state.add(0, 300)
+    state.add(500, 600)
+    state.save()
+
+    assert resumed_bytes(file_path, _document()) == 400
+    assert resumed_bytes(file_path, _document(id=7)) == 0
+    # Only looks; the .part file of the other document is left alone
+    assert os.path.exists(file_path + PART_SUFFIX)
+    assert resumed_bytes(str(tmp_path / "other.mkv"), _document()) == 0
+
+
+class FakeSender:
+    def __init__(self):
+        self.connected = True
+
+    async def disconnect(self):
+        self.connected = False
+
+
+def test_sender_pool_disconnects_senders_when_one_fails():
+    created = []
+
+    async def create_sender():
+        await asyncio.sleep(0.01 * len(created))
+        if len(created) == 2:
+            created.append(None)
+            raise ConnectionError("DC unreachable")
+        sender = FakeSender()
+        created.append(sender)
+        return sender
+
+    async def run():
+        client = SimpleNamespace(session=SimpleNamespace(auth_key=b"key", dc_id=2))
+        pool = fast_download._SenderPool(client, 2, 4)
+        pool._create_sender = create_sender
+        async with pool:
+            pass
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(run())
+    senders = [sender for sender in created if sender is not None]
+    assert len(senders) == 3
+    assert not any(sender.connected for sender in senders)
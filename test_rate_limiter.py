@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+from rate_limiter import RateLimiter, TokenBucket
+
+
+def test_burst_then_paced_at_rate():
+    bucket = TokenBucket(rate=2, burst=3)
+    now = bucket.updated
+    assert [bucket.reserve(now) for _ in range(3)] == [0.0, 0.0, 0.0]
+    # Out of tokens: each further call waits another 1/rate seconds
+    assert bucket.reserve(now) == pytest.approx(0.5)
+    assert bucket.reserve(now) == pytest.approx(1.0)
+
+
+def test_tokens_refill_up_to_burst():
+    bucket = TokenBucket(rate=2, burst=3)
+    now = bucket.updated
+    for _ in range(3):
+        bucket.reserve(now)
+    assert bucket.reserve(now + 0.5) == 0.0
+    # A long pause never banks more than `burst` tokens
+    later = now + 100
+    assert [bucket.reserve(later) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.reserve(later) == pytest.approx(0.5)
+
+
+def test_blocked_until_delays_every_call():
+    bucket = TokenBucket(rate=10, burst=5)
+    now = bucket.updated
+    bucket.blocked_until = now + 4
+    assert bucket.reserve(now) == pytest.approx(4)
+
+
+def test_penalize_empties_the_bucket():
+    limiter = RateLimiter({"default": (1000, 5)})
+    limiter.penalize("default", 5)
+    bucket = limiter._bucket("default")
+    assert bucket.tokens <= 0
+    # No tokens accrue while blocked, so after the penalty callers come back one at a time
+    assert bucket.updated == bucket.blocked_until
+    assert bucket.reserve(bucket.blocked_until) == pytest.approx(0.001)
+    assert limiter.penalties == {"default": 1}
+
+
+def test_unknown_group_uses_default_bucket():
+    limiter = RateLimiter({"default": (1000, 1), "upload": (1000, 1)})
+    assert limiter._bucket("file/info") is limiter._bucket("default")
+    limiter.acquire("file/info")
+    asyncio.run(limiter.acquire_async("upload"))
+    assert set(limiter.stats()) == {"file/info", "upload"}
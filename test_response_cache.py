@@ -0,0 +1,78 @@
+import pytest
+
+import fileMoon
+from fileMoon import ResponseCache
+
+INFO_URL = "https://filemoonapi.com/api/file/info?key=k&file_code=abc"
+LIST_URL = "https://filemoonapi.com/api/file/list?key=k&name=ep01"
+OK = {"status": 200, "msg": "OK", "result": {"files": [{"file_code": "abc"}]}}
+NOT_FOUND = {"status": 200, "msg": "OK", "result": {"files": []}}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(fileMoon.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_hit_until_ttl_expires(clock):
+    cache = ResponseCache(ttls={"file/info": 30})
+    cache.put("file/info", INFO_URL, OK)
+    assert cache.get("file/info", INFO_URL) == OK
+    clock[0] += 31
+    assert cache.get("file/info", INFO_URL) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_not_found_uses_negative_ttl(clock):
+    cache = ResponseCache(ttls={"file/list": 60}, negative_ttl=5)
+    cache.put("file/list", LIST_URL, NOT_FOUND)
+    clock[0] += 4
+    assert cache.get("file/list", LIST_URL) == NOT_FOUND
+    clock[0] += 2
+    assert cache.get("file/list", LIST_URL) is None
+
+
+def test_errors_are_not_cached(clock):
+    cache = ResponseCache()
+    cache.put("file/info", INFO_URL, {"status": 429, "msg": "Too many requests"})
+    assert cache.get("file/info", INFO_URL) is None
+
+
+def test_cacheable_needs_endpoint_and_param():
+    cache = ResponseCache()
+    assert cache.cacheable("file/list", LIST_URL)
+    assert not cache.cacheable("file/list", "https://filemoonapi.com/api/file/list?key=k&page=1")
+    assert not cache.cacheable("upload/server", "https://filemoonapi.com/api/upload/server?key=k")
+
+
+def test_invalidate_by_endpoint(clock):
+    cache = ResponseCache()
+    cache.put("file/info", INFO_URL, OK)
+    cache.put("file/list", LIST_URL, OK)
+    cache.invalidate("file/list")
+    assert cache.get("file/list", LIST_URL) is None
+    assert cache.get("file/info", INFO_URL) == OK
+    cache.invalidate()
+    assert cache.get("file/info", INFO_URL) is None
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = ResponseCache(max_entries=2)
+    urls = [f"{INFO_URL}{i}" for i in range(3)]
+    cache.put("file/info", urls[0], OK)
+    cache.put("file/info", urls[1], OK)
+    cache.get("file/info", urls[0])
+    cache.put("file/info", urls[2], OK)
+    assert cache.get("file/info", urls[1]) is None
+    assert cache.get("file/info", urls[0]) == OK
+
+
+def test_callers_cannot_mutate_cached_responses(clock):
+    cache = ResponseCache()
+    response = {"status": 200, "msg": "OK", "result": {"files": [{"file_code": "abc"}]}}
+    cache.put("file/info", INFO_URL, response)
+    response["result"]["files"].append({"file_code": "new"})
+    cache.get("file/info", INFO_URL)["result"]["files"].pop()
+    assert cache.get("file/info", INFO_URL) == OK
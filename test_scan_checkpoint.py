@@ -0,0 +1,113 @@
+import json
+
+import scan_checkpoint
+from scan_checkpoint import ScanCheckpoint
+
+
+def test_watermark_waits_for_in_flight_messages(tmp_path):
+    cp = ScanCheckpoint(str(tmp_path / "scan.json"))
+    for msg_id in (1, 2, 3):
+        cp.start(msg_id)
+    cp.finish(2)
+    cp.finish(3)
+    assert cp.last_message_id == 0
+    assert cp.is_completed(2) and cp.is_completed(3) and not cp.is_completed(1)
+
+    cp.finish(1)
+    assert cp.last_message_id == 3
+    assert cp.completed_ids == set()
+
+
+def test_seen_messages_advance_the_watermark(tmp_path):
+    cp = ScanCheckpoint(str(tmp_path / "scan.json"))
+    cp.seen(5)
+    assert cp.last_message_id == 5
+    cp.start(8)
+    cp.seen(9)
+    assert cp.last_message_id == 7
+
+
+def test_failed_message_holds_the_watermark(tmp_path):
+    cp = ScanCheckpoint(str(tmp_path / "scan.json"))
+    for msg_id in (1, 2, 3):
+        cp.start(msg_id)
+    cp.finish(1)
+    cp.finish(2, ok=False)
+    cp.finish(3)
+    assert cp.last_message_id == 1
+    assert cp.completed_ids == {3}
+    assert cp.failed_attempts == {2: 1}
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / "scan.json")
+    cp = ScanCheckpoint(path)
+    for msg_id in (1, 2, 3):
+        cp.start(msg_id)
+    cp.finish(1)
+    cp.finish(3)
+    cp.finish(2, ok=False)
+    cp.save()
+
+    loaded = ScanCheckpoint(path).load()
+    assert loaded.last_message_id == 1
+    assert loaded.completed_ids == {3}
+    assert loaded.failed_attempts == {2: 1}
+    assert not (tmp_path / "scan.json.tmp").exists()
+
+
+def test_unreadable_file_starts_from_scratch(tmp_path):
+    path = tmp_path / "scan.json"
+    path.write_text("{not json", encoding="utf-8")
+    cp = ScanCheckpoint(str(path)).load()
+    assert cp.last_message_id == 0
+    assert cp.completed_ids == set()
+
+
+def test_permanently_failing_message_is_given_up(tmp_path):
+    path = str(tmp_path / "scan.json")
+    for run in range(scan_checkpoint.MAX_ATTEMPTS):
+        cp = ScanCheckpoint(path).load()
+        for msg_id in range(cp.last_message_id + 1, 11):
+            if cp.is_completed(msg_id):
+                cp.seen(msg_id)
+                continue
+            cp.start(msg_id)
+            cp.finish(msg_id, ok=msg_id != 3)
+        cp.save()
+
+    with open(path, encoding="utf-8") as f:
+        state = json.load(f)
+    assert state == {"last_message_id": 10, "completed_ids": [], "failed_attempts": {}, "given_up_ids": [3]}
+
+
+def test_reset_forgets_everything(tmp_path):
+    cp = ScanCheckpoint(str(tmp_path / "scan.json"))
+    cp.start(1)
+    cp.finish(1, ok=False)
+    cp.seen(4)
+    cp.reset()
+    assert cp.last_message_id == 0
+    assert cp.failed_attempts == {}
+    assert not cp.is_completed(1)
+
+
+def test_interrupted_message_is_retried_without_counting_an_attempt(tmp_path):
+    path = str(tmp_path / "scan.json")
+    for run in range(scan_checkpoint.MAX_ATTEMPTS + 1):
+        cp = ScanCheckpoint(path).load()
+        for msg_id in range(cp.last_message_id + 1, 11):
+            if cp.is_completed(msg_id):
+                cp.seen(msg_id)
+                continue
+            cp.start(msg_id)
+            if msg_id != 5:
+                cp.finish(msg_id)
+            # 5 is still downloading when the run is interrupted: never finished
+        cp.save()
+
+    cp = ScanCheckpoint(path).load()
+    assert cp.last_message_id == 4
+    assert not cp.is_completed(5)
+    assert cp.failed_attempts == {}
+    assert cp.given_up_ids == set()
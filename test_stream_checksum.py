@@ -0,0 +1,66 @@
+import io
+import random
+
+import pytest
+
+import stream_checksum
+from stream_checksum import CHECKSUM_ALGORITHM, StreamHasher, new_hash
+
+DATA = bytes(random.Random(0).getrandbits(8) for _ in range(10000))
+
+
+def _expected(data=DATA):
+    h = new_hash()
+    h.update(data)
+    return f"{CHECKSUM_ALGORITHM}:{h.hexdigest()}"
+
+
+def _chunks(size=700):
+    return [(offset, DATA[offset:offset + size]) for offset in range(0, len(DATA), size)]
+
+
+def test_in_order_feed():
+    hasher = StreamHasher()
+    for offset, data in _chunks():
+        hasher.feed(offset, data)
+    assert hasher.offset == len(DATA)
+    assert hasher.hexdigest() == _expected()
+
+
+def test_out_of_order_feed_is_buffered():
+    chunks = _chunks()
+    random.Random(1).shuffle(chunks)
+    hasher = StreamHasher()
+    for offset, data in chunks:
+        hasher.feed(offset, data)
+    assert hasher.offset == len(DATA)
+    assert hasher._pending_bytes == 0
+    assert hasher.hexdigest() == _expected()
+
+
+def test_refetched_and_overlapping_chunks():
+    hasher = StreamHasher()
+    hasher.feed(0, DATA[:1000])
+    hasher.feed(0, DATA[:500])
+    hasher.feed(800, DATA[800:2000])
+    hasher.feed(1500, DATA[1500:len(DATA)])
+    assert hasher.hexdigest() == _expected()
+
+
+def test_catch_up_reads_back_what_was_not_buffered(monkeypatch):
+    monkeypatch.setattr(stream_checksum, "READ_SIZE", 256)
+    chunks = _chunks()
+    hasher = StreamHasher(max_pending=1500)
+    # First chunk never fed (e.g. written by an earlier run), the rest arrive backwards
+    for offset, data in reversed(chunks[1:]):
+        hasher.feed(offset, data)
+    assert hasher.offset == 0
+    hasher.catch_up(io.BytesIO(DATA), len(DATA))
+    assert hasher.offset == len(DATA)
+    assert hasher.hexdigest() == _expected()
+
+
+def test_catch_up_past_end_of_file_raises():
+    hasher = StreamHasher()
+    with pytest.raises(IOError):
+        hasher.catch_up(io.BytesIO(DATA[:100]), 200)
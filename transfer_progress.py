@@ -0,0 +1,170 @@
+"""
+Shared progress registry for downloads and uploads.
+
+Each transfer gets one of a fixed number of slots holding a monotonic byte
+counter. Progress callbacks only store the latest byte count in their slot;
+a single reporter thread samples all slots every few seconds and computes
+per-transfer and aggregate bytes/s and ETA. That keeps per-chunk work in the
+transfer path down to one attribute assignment, no matter how many
+transfers run at once.
+
+Works the same from asyncio code (app.py) and from threads (movie_uploader.py,
+flask_bot.py, server.py).
+"""
+import threading
+import time
+
+DEFAULT_CAPACITY = 64
+DEFAULT_INTERVAL = 5.0
+
+
+class TransferSlot:
+    __slots__ = ("index", "name", "total", "done", "started", "rate", "_sampled")
+
+    def __init__(self, index):
+        self.index = index
+        self._reset(None, 0)
+
+    def _reset(self, name, total):
+        self.name = name
+        self.total = total or 0
+        self.done = 0
+        self.started = time.monotonic()
+        self.rate = 0.0
+        self._sampled = None  # done at the last reporter sample; None until first seen
+
+    def update(self, current, total=None):
+        """Progress callback body: record the absolute byte count. Cheap on purpose."""
+        self.done = current
+        if total:
+            self.total = total
+
+    @property
+    def percent(self):
+        return int(self.done * 100 / self.total) if self.total else 0
+
+    @property
+    def eta(self):
+        """Seconds left at the current rate, or None if unknown."""
+        if not self.total or self.rate <= 0:
+            return None
+        return max(0.0, (self.total - self.done) / self.rate)
+
+
+class TransferProgress:
+    def __init__(self, label="Transfers", capacity=DEFAULT_CAPACITY, interval=DEFAULT_INTERVAL):
+        """
+        Args:
+            label (str): prefix for reporter lines, e.g. "Downloads"
+            capacity (int): number of slots; transfers beyond it still work but are not reported
+            interval (float): seconds between reporter samples
+        """
+        self.label = label
+        self.interval = interval
+        self._slots = [TransferSlot(i) for i in range(capacity)]
+        self._free = list(range(capacity - 1, -1, -1))
+        self._active = set()
+        self._lock = threading.Lock()
+        self.finished_bytes = 0  # bytes of transfers already closed
+        self.rate = 0.0          # aggregate bytes/s at the last sample
+        self._last_total = None
+        self._last_sample = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def open(self, name, total=0):
+        """Claims a slot for a new transfer."""
+        with self._lock:
+            if not self._free:
+                # Out of slots: hand back a detached slot so callers need no special case
+                slot = TransferSlot(-1)
+                slot._reset(name, total)
+                return slot
+            # A fresh slot object per transfer, so a late close() of an earlier one can't free it
+            slot = TransferSlot(self._free.pop())
+            slot._reset(name, total)
+            self._slots[slot.index] = slot
+            self._active.add(slot.index)
+            return slot
+
+    def close(self, slot):
+        """Releases a slot once its transfer ended (successfully or not). Closing twice is harmless."""
+        with self._lock:
+            if slot.index < 0 or self._slots[slot.index] is not slot:
+                return
+            if slot.index in self._active:
+                self._active.discard(slot.index)
+                self.finished_bytes += slot.done
+                self._free.append(slot.index)
+            slot.index = -1
+
+    def total_bytes(self):
+        """Monotonic count of bytes moved by every transfer so far."""
+        with self._lock:
+            return self.finished_bytes + sum(self._slots[i].done for i in self._active)
+
+    def sample(self):
+        """Updates per-slot and aggregate rates. Returns the active slots."""
+        now = time.monotonic()
+        with self._lock:
+            active = [self._slots[i] for i in sorted(self._active)]
+            total = self.finished_bytes + sum(slot.done for slot in active)
+        elapsed = (now - self._last_sample) if self._last_sample else None
+        for slot in active:
+            if slot._sampled is not None and elapsed:
+                slot.rate = (slot.done - slot._sampled) / elapsed
+            slot._sampled = slot.done
+        if self._last_total is not None and elapsed:
+            self.rate = (total - self._last_total) / elapsed
+        self._last_total = total
+        self._last_sample = now
+        return active
+
+    def report(self):
+        active = self.sample()
+        if not active:
+            return
+        print(f"📊 {self.label}: {len(active)} active, {_format_bytes(self.rate)}/s total")
+        for slot in active:
+            eta = slot.eta
+            eta_text = _format_duration(eta) if eta is not None else "--"
+            print(f"   ⏳ {slot.name}: {slot.percent}% ({_format_bytes(slot.rate)}/s, ETA {eta_text})")
+
+    def start_reporter(self):
+        """Starts the single background reporter (a daemon thread)."""
+        if self._thread and self._thread.is_alive():
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run_reporter, name=f"{self.label}-progress", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop_reporter(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval)
+            self._thread = None
+
+    def _run_reporter(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.report()
+            except Exception as e:
+                print(f"⚠️ Progress reporter error: {e}")
+
+
+def _format_bytes(count):
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(count) < 1024:
+            return f"{count:.1f} {unit}"
+        count /= 1024
+    return f"{count:.1f} TB"
+
+
+def _format_duration(seconds):
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{(seconds % 3600) // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
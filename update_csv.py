@@ -1,63 +1,61 @@
 import os
 import csv
+import asyncio
 from dotenv import load_dotenv
-from fileMoon import FileMoon
+from fileMoon import AsyncFileMoon, shared_rate_limiter
+
+CSV_FIELDS = ['file_code', 'title', 'file_size', 'uploaded', 'status', 'public']
+
+
+async def export_files_csv(client, csv_filename, progress_every=500):
+    """
+    Writes every file of the account to `csv_filename`, fetching pages concurrently.
+    Rows go to a temporary file that replaces `csv_filename` only once every
+    page has arrived; if the listing fails, the old CSV is left as it was.
+    Returns the number of files written.
+    """
+    total_files = 0
+    tmp_filename = f"{csv_filename}.tmp"
+    try:
+        with open(tmp_filename, mode='w', newline='', encoding='utf-8') as csv_file:
+            writer = csv.DictWriter(csv_file, fieldnames=CSV_FIELDS)
+            writer.writeheader()
+
+            async for file_data in client.iter_all_files(per_page=100):
+                writer.writerow({field: file_data.get(field, '') for field in CSV_FIELDS})
+                total_files += 1
+                if progress_every and total_files % progress_every == 0:
+                    print(f"✅ Fetched {total_files} files so far...")
+        os.replace(tmp_filename, csv_filename)
+    finally:
+        if os.path.exists(tmp_filename):
+            os.remove(tmp_filename)
+    return total_files
+
+
+async def _update(api_key, csv_filename):
+    async with AsyncFileMoon(api_key) as client:
+        return await export_files_csv(client, csv_filename)
+
 
 def main():
     # Load environment variables
     load_dotenv()
-    
+
     api_key = os.getenv("FILEMOON_API_KEY")
     if not api_key:
         print("❌ Error: FILEMOON_API_KEY not found in .env file.")
         return
 
-    # Initialize FileMoon client
-    client = FileMoon(api_key)
     csv_filename = "filemoon_files.csv"
-    
+
     print(f"🔄 Updating {csv_filename} from FileMoon API...")
-    
+
     try:
-        with open(csv_filename, mode='w', newline='', encoding='utf-8') as csv_file:
-            fieldnames = ['file_code', 'title', 'file_size', 'uploaded', 'status', 'public']
-            writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
-            writer.writeheader()
-            
-            page = 1
-            total_files = 0
-            
-            while True:
-                response = client.f_list(per_page="100", page=str(page))
-                
-                if not response or 'result' not in response or 'files' not in response['result']:
-                    print(f"⚠️ No more files found or API error at page {page}.")
-                    break
-                
-                files = response['result']['files']
-                if not files:
-                    break
-                
-                for file_data in files:
-                    writer.writerow({
-                        'file_code': file_data.get('file_code', ''),
-                        'title': file_data.get('title', ''),
-                        'file_size': file_data.get('file_size', ''),
-                        'uploaded': file_data.get('uploaded', ''),
-                        'status': file_data.get('status', ''),
-                        'public': file_data.get('public', '')
-                    })
-                
-                num_on_page = len(files)
-                total_files += num_on_page
-                print(f"✅ Page {page}: Fetched {num_on_page} files (Total: {total_files})")
-                
-                if num_on_page < 100:
-                    break
-                page += 1
-                
+        total_files = asyncio.run(_update(api_key, csv_filename))
         print(f"🎉 Successfully updated {csv_filename} with {total_files} files.")
-        
+        shared_rate_limiter().report("FileMoon API")
+
     except Exception as e:
         print(f"❌ Error updating CSV: {e}")
 